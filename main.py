@@ -7,11 +7,23 @@ def main(args):
     plant = Plant.from_json_file(args.input_file_path)
     planification = Planification(
         plant=plant,
-        horizon=30 * 24,
+        horizon=args.horizon_days * plant.intervals_per_day,
         orders_plan={},
         grades_plan={}
     )
-    planification.calculate_initial_solution()
+    if args.window_days:
+        planification.calculate_rolling_horizon_solution(
+            window=args.window_days * plant.intervals_per_day,
+            overlap=args.overlap_days * plant.intervals_per_day,
+        )
+    else:
+        trace = planification.calculate_initial_solution(
+            record_trace=bool(args.trace_file_path),
+            top_k_orders=args.top_k_orders,
+            n_sample_grades=args.n_sample_grades,
+        )
+        if trace is not None:
+            trace.save(args.trace_file_path)
     planification.save_data(args.output_file_path)
     return
 
@@ -25,7 +37,21 @@ if __name__ == '__main__':
                             type=str, help='Input file for planification data')
         parser.add_argument('--output_file_path', dest='output_file_path',
                             type=str, help='Output file for planification solution')
+        parser.add_argument('--horizon_days', dest='horizon_days', default=30,
+                            type=int, help='Planification horizon in days')
+        parser.add_argument('--window_days', dest='window_days', default=None,
+                            type=int, help='Solve by rolling windows of this number of days')
+        parser.add_argument('--overlap_days', dest='overlap_days', default=30,
+                            type=int, help='Extra days of orders considered in every rolling window')
+        parser.add_argument('--trace_file_path', dest='trace_file_path', default=None,
+                            type=str, help='Output file for the trace of the greedy decisions')
+        parser.add_argument('--top_k_orders', dest='top_k_orders', default=None,
+                            type=int, help='Approximate greedy: orders considered per grade')
+        parser.add_argument('--n_sample_grades', dest='n_sample_grades', default=None,
+                            type=int, help='Approximate greedy: candidate grades evaluated per step')
         args = parser.parse_args()
+        if args.window_days and args.trace_file_path:
+            parser.error('--trace_file_path is not available with --window_days')
         main(args)
 
     except RuntimeError as e:
@@ -0,0 +1,108 @@
+import math
+import numpy as np
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+MaintenanceStop = Tuple[float, float]  # (start_time, end_time)
+
+
+class MaintenanceCalendar:
+    """
+    Maintenance stops of every unit, indexed for O(log n) lookups.
+
+    ...
+    Attributes
+    ----------
+    starts: Dict[int, List[float]]
+        unit -> sorted start times of the stops (overlapping stops are merged)
+    ends: Dict[int, List[float]]
+        unit -> end times of the stops, same order as starts
+    cum_durations: Dict[int, List[float]]
+        unit -> cum_durations[i] is the blocked time of the first i stops
+    """
+    def __init__(self, maintenance_stops: Dict[int, List[MaintenanceStop]] = None, n_units: int = 0):
+        maintenance_stops = maintenance_stops or {}
+        self.n_units = n_units
+        self.starts = {}
+        self.ends = {}
+        self.cum_durations = {}
+        for unit in range(n_units):
+            starts, ends = self.merge_stops(maintenance_stops.get(unit, []))
+            self.starts[unit] = starts
+            self.ends[unit] = ends
+            cum_durations = [0.]
+            for start, end in zip(starts, ends):
+                cum_durations.append(cum_durations[-1] + end - start)
+            self.cum_durations[unit] = cum_durations
+
+    @staticmethod
+    def merge_stops(stops: List[MaintenanceStop]):
+        """
+        returns (starts, ends) of the sorted stops, merging the ones that overlap or touch
+        """
+        starts, ends = [], []
+        for start, end in sorted((float(start), float(end)) for start, end in stops):
+            if start >= end:
+                raise ValueError(f'Maintenance stop with start {start} >= end {end}')
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    def stops(self, unit) -> List[MaintenanceStop]:
+        return list(zip(self.starts[unit], self.ends[unit]))
+
+    def to_dict(self):
+        return {unit: [list(stop) for stop in self.stops(unit)]
+                for unit in range(self.n_units) if self.starts[unit]}
+
+    def free_gap(self, unit, time):
+        """
+        returns (start, end) of the first time interval without stops from time on,
+        start is time if the unit is not stopped at time, end is math.inf if there are no more stops
+        """
+        starts, ends = self.starts[unit], self.ends[unit]
+        if not starts:
+            return time, math.inf
+        i = bisect_right(starts, time) - 1
+        start = ends[i] if i >= 0 and time < ends[i] else time
+        j = bisect_right(starts, start)
+        end = starts[j] if j < len(starts) else math.inf
+        return start, end
+
+    def blocked_time(self, unit, start, end):
+        """
+        returns the time of the stops between start and end
+        """
+        starts, ends = self.starts[unit], self.ends[unit]
+        first = bisect_right(ends, start)
+        last = bisect_left(starts, end)
+        if first >= last:
+            return 0.
+        cum_durations = self.cum_durations[unit]
+        blocked = cum_durations[last] - cum_durations[first]
+        blocked -= max(0., start - starts[first])
+        blocked -= max(0., ends[last - 1] - end)
+        return blocked
+
+    def blocked_times(self, units, start_times, end_times):
+        """
+        blocked_time of every row of the np.arrays units, start_times and end_times
+        """
+        blocked = np.zeros(len(units))
+        for unit in np.unique(units).tolist():
+            rows = units == unit
+            blocked[rows] = self.blocked_time_until(unit, end_times[rows]) - \
+                self.blocked_time_until(unit, start_times[rows])
+        return blocked
+
+    def blocked_time_until(self, unit, times):
+        """
+        returns the time of the stops before every time of times (np.array)
+        """
+        # stops started at every time, the last one can still be in progress
+        n_started = np.searchsorted(self.starts[unit], times, side='right')
+        last_ends = np.r_[-math.inf, self.ends[unit]][n_started]
+        return np.asarray(self.cum_durations[unit])[n_started] - np.maximum(0., last_ends - times)
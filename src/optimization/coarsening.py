@@ -0,0 +1,127 @@
+import numpy as np
+from typing import Dict, List, Tuple, Union
+from ..plant import OrderItem
+from ..plan import OrdersPlan
+
+# order_id of orders kept alone, ('bucket', n) for buckets so they never collide with order ids
+BucketId = Union[str, Tuple[str, int]]
+
+
+class OrdersCoarsening:
+    """
+    Aggregate similar orders of the same grade into buckets solved as a single order.
+
+    Orders of every grade are binned by price per ton and by tons (quantile bins), and
+    consecutive orders of a bin, sorted by price per ton, are grouped into buckets of at most
+    max_bucket_tons. Orders bigger than max_bucket_tons are kept alone.
+    """
+    def __init__(
+            self,
+            orders: Dict[str, OrderItem],
+            n_price_bins: int = 8,
+            n_size_bins: int = 2,
+            max_bucket_tons: float = 3000,
+    ):
+        """
+        n_price_bins: price per ton bins per grade, more bins => smaller loss
+        n_size_bins: tons bins per grade
+        max_bucket_tons: maximum tons of a bucket, 0 => no coarsening
+        """
+        self.orders = orders
+        self.n_price_bins = n_price_bins
+        self.n_size_bins = n_size_bins
+        self.max_bucket_tons = max_bucket_tons
+        # bucket_id -> [order_id]
+        self.bucket2orders: Dict[BucketId, List[str]] = {}
+        # bucket_id -> (grade, tons, price, priority)
+        self.coarse_orders: Dict[BucketId, OrderItem] = {}
+        self.build_buckets()
+
+    @staticmethod
+    def quantile_bins(values, n_bins):
+        if n_bins <= 1 or len(values) == 0:
+            return np.zeros(len(values), dtype=int)
+        edges = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+        return np.searchsorted(edges, values, side='right')
+
+    def build_buckets(self):
+        order_ids = list(self.orders.keys())
+        if not order_ids:
+            return
+        grade, tons, price, priority = np.array([self.orders[order_id] for order_id in order_ids], dtype=float).T
+        grade = grade.astype(int)
+        price_per_ton = price / tons
+
+        price_bins = np.zeros(len(order_ids), dtype=int)
+        size_bins = np.zeros(len(order_ids), dtype=int)
+        for g in np.unique(grade):
+            grade_orders = grade == g
+            price_bins[grade_orders] = self.quantile_bins(price_per_ton[grade_orders], self.n_price_bins)
+            size_bins[grade_orders] = self.quantile_bins(tons[grade_orders], self.n_size_bins)
+
+        order = np.lexsort((-price_per_ton, size_bins, price_bins, grade))
+        bucket, bucket_tons, cell = [], 0., None
+        for i in order:
+            order_cell = (grade[i], price_bins[i], size_bins[i])
+            if bucket and (order_cell != cell or bucket_tons + tons[i] > self.max_bucket_tons):
+                self.add_bucket(bucket, grade, tons, price, priority, order_ids)
+                bucket, bucket_tons = [], 0.
+            bucket.append(i)
+            bucket_tons += tons[i]
+            cell = order_cell
+        self.add_bucket(bucket, grade, tons, price, priority, order_ids)
+
+    def add_bucket(self, bucket, grade, tons, price, priority, order_ids):
+        if len(bucket) == 1:
+            order_id = order_ids[bucket[0]]
+            self.bucket2orders[order_id] = [order_id]
+            self.coarse_orders[order_id] = self.orders[order_id]
+            return
+        bucket_id = ('bucket', len(self.coarse_orders))
+        bucket_tons = tons[bucket].sum()
+        self.bucket2orders[bucket_id] = [order_ids[i] for i in bucket]
+        self.coarse_orders[bucket_id] = (
+            int(grade[bucket[0]]),
+            float(bucket_tons),
+            float(price[bucket].sum()),
+            float((priority[bucket] * tons[bucket]).sum() / bucket_tons),
+        )
+
+    @property
+    def reduction(self):
+        """
+        returns the percentage of orders removed by the coarsening
+        """
+        if not self.orders:
+            return 0.
+        return 100 * (1 - len(self.coarse_orders) / len(self.orders))
+
+    def split_orders_plan(self, orders_plan: OrdersPlan):
+        """
+        returns orders_plan with buckets split back into their orders, one after the other.
+        Time and cost are split by tons, revenue by price with the price reduction of the bucket.
+        """
+        fine_orders_plan = OrdersPlan(orders_plan.n_units)
+        for unit, order_list in orders_plan.items():
+            for (bucket_id, grade, start_time, end_time, benefit, revenue) in order_list:
+                bucket_orders = self.bucket2orders[bucket_id]
+                if len(bucket_orders) == 1:
+                    fine_orders_plan.append(unit, bucket_orders[0], grade, start_time, end_time, benefit, revenue)
+                    continue
+                (_, bucket_tons, bucket_price, _) = self.coarse_orders[bucket_id]
+                price_reduction = revenue / bucket_price
+                cost = revenue - benefit
+                init_time = start_time
+                for order_id in bucket_orders:
+                    (_, tons, price, _) = self.orders[order_id]
+                    share = tons / bucket_tons
+                    order_end_time = init_time + (end_time - start_time) * share
+                    order_revenue = price * price_reduction
+                    fine_orders_plan.append(
+                        unit, order_id, grade, init_time, order_end_time, order_revenue - cost * share, order_revenue
+                    )
+                    init_time = order_end_time
+        return fine_orders_plan
+
+    def split_orders_completed(self, orders_completed):
+        return {order_id for bucket_id in orders_completed for order_id in self.bucket2orders[bucket_id]}
@@ -1,7 +1,17 @@
 import math
 import numpy as np
-from typing import Set
-from ..plant import Plant
+from typing import Dict
+from ..plant import Plant, OrderItem
+from ..orders import OrdersState
+from ..maintenance import MaintenanceCalendar
+from ..plan import OrdersPlan, GradesPlan
+from .trace import GreedyTrace
+from .scoring import CandidateScoring
+
+# relative slack added to ratio bounds before pruning, covers float rounding in group ratios
+RATIO_BOUND_TOL = 1e-9
+# slack for order groups ending at a maintenance stop, covers float rounding in group times
+GAP_TOL = 1e-9
 
 
 class UnitGreedySimpleGroup:
@@ -11,22 +21,55 @@ class UnitGreedySimpleGroup:
             unit: int,
             complete: bool = False,
             horizon: int = 30 * 24,
-            orders_completed: Set[str] = set(),
-            # TODO: Maintenance stops
+            orders_state: OrdersState = None,
+            maintenance: MaintenanceCalendar = None,
+            orders_plan: OrdersPlan = None,
+            grades_plan: GradesPlan = None,
+            top_k_orders: int = None,
+            n_sample_grades: int = None,
+            grade_sampling: str = 'bound',
+            random_state: np.random.RandomState = None,
+            macro_grades: bool = False,
     ):
+        """
+        orders_state: orders shared with the other unit models,
+            plant.orders['firm'] by default
+        maintenance: maintenance stops, plant.maintenance by default
+        orders_plan, grades_plan: plans shared with the other unit models, new ones by default
+        top_k_orders: approximate mode, only the top_k_orders remaining orders of every grade
+            (by price per ton) are considered, all of them by default
+        n_sample_grades: approximate mode, only n_sample_grades candidate grades with a solution
+            are evaluated per step, all of them by default
+        grade_sampling: 'bound' evaluates the candidates with the best ratio bound,
+            'random' evaluates them in random order
+        random_state: random generator for grade_sampling='random'
+        macro_grades: the forced chains of plant.macro_grades are evaluated as single candidates,
+            instead of their grades one by one
+        """
+        if grade_sampling not in ('bound', 'random'):
+            raise ValueError(f'Unknown grade_sampling {grade_sampling}')
         self.plant = plant
         self.unit = unit
         self.complete = complete
         self.horizon = horizon
-        self.orders_completed = orders_completed.copy()
-
-        # [(order_id, grade, start_time, end_time, benefit, revenue)]
-        self.orders_plan = []
-        self.grades_plan = []  # [(grade, start_time)]
-
-        self.orders = plant.orders['firm'].copy()
-        self.grade2orders = self.plant.group_orders_by_grade(self.orders)
+        self.maintenance = plant.maintenance if maintenance is None else maintenance
+        self.top_k_orders = top_k_orders
+        self.n_sample_grades = n_sample_grades
+        self.grade_sampling = grade_sampling
+        self.random_state = np.random.RandomState() if random_state is None else random_state
+        self.macro_grades = macro_grades
+
+        # unit -> [(order_id, grade, start_time, end_time, benefit, revenue)]
+        self.orders_plan = OrdersPlan(plant.n_units) if orders_plan is None else orders_plan
+        # unit -> [(grade, start_time)]
+        self.grades_plan = GradesPlan(plant.n_units) if grades_plan is None else grades_plan
+
+        if orders_state is None:
+            orders_state = OrdersState(plant.orders['firm'], plant.n_grades)
+        self.orders_state = orders_state
         self.grades = list(range(plant.n_grades))
+        # grade -> (remaining orders, {(time_reg_left, time_left, time_max): best order group})
+        self.order_groups = {}
 
         self.time_last_grade_start = 0
         self.time_left_grade_change = 0  # time before we can make a transition
@@ -38,8 +81,32 @@ class UnitGreedySimpleGroup:
         self.time = 0
         self.actual_grade = -1
 
-    def update_orders_completed(self, new_orders):
-        self.orders_completed.update(new_orders)
+    def get_state(self):
+        """
+        returns the unit state needed to continue the planification from self.time
+        """
+        return {
+            'time': self.time,
+            'actual_grade': self.actual_grade,
+            'time_last_grade_start': self.time_last_grade_start,
+            'time_left_grade_change': self.time_left_grade_change,
+            'time_reg_left': self.time_reg_left,
+            'is_initial': self.is_initial,
+            'stocks': self.stocks.copy(),
+        }
+
+    def set_state(self, state):
+        """
+        continue the planification from a state returned by get_state
+        """
+        self.time = state['time']
+        self.actual_grade = state['actual_grade']
+        self.time_last_grade_start = state['time_last_grade_start']
+        self.time_left_grade_change = state['time_left_grade_change']
+        self.time_reg_left = state['time_reg_left']
+        self.is_initial = state['is_initial']
+        self.stocks = state['stocks'].copy()
+        self.complete = self.time >= self.horizon
 
     def calculate_min_stock_time_cost(self, grade):
         prod_flow = self.plant.prod_flow[grade, self.unit]
@@ -74,22 +141,38 @@ class UnitGreedySimpleGroup:
         ratio = benefit / time
         return ratio, time, benefit, revenue
 
-    def calculate_best_grade_order_group(self, grade_orders, time_reg_left=3, time_left=0):
+    def calculate_grade_ratio_bound(self, grade):
         """
+        Upper bound of the ratio of any order group of grade (best unpenalized ratio
+        among remaining orders). Returns None if there are no remaining orders of grade.
+        """
+        price_per_ton = self.orders_state.best_price_per_ton(grade)
+        if price_per_ton is None:
+            return None
+        ratio = price_per_ton * self.plant.prod_flow[grade, self.unit] - self.plant.man_cost[grade, self.unit]
+        # idle time until t_min can push a negative ratio up towards 0
+        return max(ratio, 0)
+
+    def calculate_best_grade_order_group(self, grade_orders, time_reg_left=3, time_left=0, time_max=math.inf):
+        """
+        grade_orders: order indices in self.orders_state
         time_reg_left: time to have regular production, before this time, price is penalized
+        time_max: time until the next maintenance stop, the group must end before it
         """
-        orders_data = [(order_id, self.calculate_order_time_benefit(
-            self.orders[order_id], time_reg_left)) for order_id in grade_orders]
+        orders = self.orders_state.orders
+        orders_data = [(order_index, self.calculate_order_time_benefit(
+            orders[order_index], time_reg_left)) for order_index in grade_orders]
+        orders_data = [z for z in orders_data if z[1][1] <= time_max]
 
         if not orders_data:
             return None
 
         if time_left == 0:
-            order_id, (ratio, time, benefit, revenue) = max(
+            order_index, (ratio, time, benefit, revenue) = max(
                 orders_data,
                 key=lambda z: z[1][0]
             )
-            orders_group = [(order_id, ratio, time, benefit, revenue)]
+            orders_group = [(order_index, ratio, time, benefit, revenue)]
             return (ratio, time, benefit, revenue), orders_group
 
         aggregated_time = 0
@@ -98,64 +181,198 @@ class UnitGreedySimpleGroup:
         orders_done = set()
         orders_group = []
         while aggregated_time < time_left:
-            order_id, (ratio, time, benefit, revenue) = max(
+            order_index, (ratio, time, benefit, revenue) = max(
                 orders_data, key=lambda z: z[1][0]
             )
-            orders_group.append((order_id, ratio, time, benefit, revenue))
+            orders_group.append((order_index, ratio, time, benefit, revenue))
             aggregated_time += time
             aggregated_benefit += benefit
             aggregated_revenue += revenue
-            orders_done.add(order_id)
+            orders_done.add(order_index)
 
             time_reg_left = max(time_reg_left-aggregated_time, 0)
             orders_data = [
-                (order_id2, self.calculate_order_time_benefit(
-                    self.orders[order_id2], time_reg_left))
-                for order_id2 in grade_orders if order_id2 not in orders_done]
+                (order_index2, self.calculate_order_time_benefit(
+                    orders[order_index2], time_reg_left))
+                for order_index2 in grade_orders if order_index2 not in orders_done]
+            orders_data = [z for z in orders_data if z[1][1] <= time_max - aggregated_time]
             if not orders_data:
                 break
 
-        aggregated_time += max(0, time_left - aggregated_time)
+        aggregated_time += max(0, min(time_left, time_max) - aggregated_time)
         ratio = aggregated_benefit / aggregated_time
         group_data = (ratio, aggregated_time,
                       aggregated_benefit, aggregated_revenue)
         return group_data, orders_group
 
-    def calculate_best_grade_solution(self, actual_grade, possible_transitions):
-
-        grade_solutions = []
-        for grade in possible_transitions:
-
-            grade_change = (grade != actual_grade)
-            if grade_change:
-                time_reg_left = self.plant.t_transition[actual_grade, grade]
-                time_left = self.calculate_min_transition_time(grade)
-            else:
-                time_reg_left = self.time_reg_left
-                time_left = self.time_left_grade_change
+    def calculate_grade_order_group(self, grade, time_reg_left, time_left, time_max):
+        """
+        calculate_best_grade_order_group of the remaining orders of grade, cached until
+        an order of grade is completed (orders are only removed, the count identifies them)
+        """
+        n_remaining = self.orders_state.remaining[grade]
+        if self.order_groups.get(grade, (None,))[0] != n_remaining:
+            self.order_groups[grade] = (n_remaining, {})
+        groups = self.order_groups[grade][1]
+        key = (time_reg_left, time_left, time_max)
+        if key not in groups:
+            groups[key] = self.calculate_best_grade_order_group(
+                self.orders_state.remaining_orders(grade, self.top_k_orders), time_reg_left, time_left, time_max)
+        return groups[key]
+
+    def calculate_macro_grade_ratio_bound(self, macro_grade):
+        """
+        Upper bound of the ratio of any part of macro_grade produced from its first grade,
+        the best bound of its grades up to the first one without remaining orders.
+        Returns None if the first grade has no remaining orders.
+        """
+        bound = None
+        for grade in macro_grade:
+            grade_bound = self.calculate_grade_ratio_bound(grade)
+            if grade_bound is None:
+                break
+            bound = grade_bound if bound is None else max(bound, grade_bound)
+        return bound
 
-            if grade not in self.grade2orders:
-                continue
-            grade_orders = self.grade2orders[grade] - self.orders_completed
-            best_order_data = self.calculate_best_grade_order_group(
-                grade_orders, time_reg_left, time_left)
+    def calculate_best_macro_grade_solution(self, actual_grade, macro_grade, time_max=math.inf,
+                                            min_ratio=-math.inf):
+        """
+        Best order groups of the grades of macro_grade produced one after the other from actual_grade,
+        every grade during at least its t_min, cut after the grade with the best ratio of the chain.
+        Chains of two or more grades keep the solution of every grade in 'chain'.
+        min_ratio: the chain is not extended once it can not beat it
+        returns None if the first grade has no solution
+        """
+        bounds = [self.calculate_grade_ratio_bound(grade) for grade in macro_grade]
+        if None in bounds:
+            bounds = bounds[:bounds.index(None)]
+        # rest_bounds[i]: bound of the grades of the chain after the i-th one
+        rest_bounds = list(np.maximum.accumulate(bounds[::-1])[::-1][1:]) + [None]
+        best_solution = None
+        chain = []
+        prev_grade = actual_grade
+        chain_time = chain_benefit = chain_revenue = 0
+        for i, grade in enumerate(macro_grade):
+            time_left = self.calculate_min_transition_time(grade)
+            if i == len(bounds) or chain_time + time_left > time_max:
+                break
+            best_order_data = self.calculate_grade_order_group(
+                grade, self.plant.t_transition[prev_grade, grade], time_left, time_max - chain_time)
             if best_order_data is None:
-                continue
+                break
             (ratio, order_time, benefit, revenue), orders_group = best_order_data
-
-            solution = {
+            chain.append({
                 'orders_group': orders_group,
                 'ratio': ratio,
                 'order_time': order_time,
                 'grade': grade,
                 'benefit': benefit,
-                'revenue': revenue
-            }
+                'revenue': revenue,
+                'chained': True
+            })
+            chain_time += order_time
+            chain_benefit += benefit
+            chain_revenue += revenue
+            prev_grade = grade
+
+            chain_ratio = chain_benefit / chain_time
+            if best_solution is None or chain_ratio > best_solution['ratio']:
+                best_solution = {
+                    'orders_group': [order for solution in chain for order in solution['orders_group']],
+                    'ratio': chain_ratio,
+                    'order_time': chain_time,
+                    'grade': macro_grade[0],
+                    'benefit': chain_benefit,
+                    'revenue': chain_revenue,
+                    'chain': list(chain)
+                }
+            # a longer chain mixes the chain so far with the rest of it
+            if rest_bounds[i] is None or max(chain_ratio, rest_bounds[i]) <= max(min_ratio, best_solution['ratio']):
+                break
 
-            grade_solutions.append(solution)
-        if not grade_solutions:
-            return {}
-        best_solution = max(grade_solutions, key=lambda z: z['ratio'])
+        if best_solution is not None and len(best_solution['chain']) == 1:
+            best_solution = {key: value for key, value in chain[0].items() if key != 'chained'}
+        return best_solution
+
+    def calculate_best_single_grade_solution(self, actual_grade, grade, time_max=math.inf):
+        grade_change = (grade != actual_grade)
+        if grade_change:
+            time_reg_left = self.plant.t_transition[actual_grade, grade]
+            time_left = self.calculate_min_transition_time(grade)
+            if time_left > time_max:
+                return None
+        else:
+            time_reg_left = self.time_reg_left
+            time_left = self.time_left_grade_change
+
+        best_order_data = self.calculate_grade_order_group(
+            grade, time_reg_left, time_left, time_max)
+        if best_order_data is None:
+            return None
+        (ratio, order_time, benefit, revenue), orders_group = best_order_data
+        return {
+            'orders_group': orders_group,
+            'ratio': ratio,
+            'order_time': order_time,
+            'grade': grade,
+            'benefit': benefit,
+            'revenue': revenue
+        }
+
+    def calculate_best_grade_solution(self, actual_grade, possible_transitions, time_max=math.inf,
+                                      possible_macro_grades=()):
+        """
+        time_max: time until the next maintenance stop, a new grade needs t_min before it.
+        possible_macro_grades: chains of grades (calculate_best_macro_grade_solution), evaluated as
+            single candidates after the grades of possible_transitions.
+        Grades are visited by decreasing ratio bound and the search stops when the bound
+        falls below the best ratio found. Ties keep the first grade in possible_transitions.
+        In approximate mode (n_sample_grades) the search also stops after n_sample_grades solutions.
+        The (grade, ratio) of every evaluated candidate are in 'candidates' of the best solution.
+        """
+        candidates = []
+        for position, grade in enumerate(possible_transitions):
+            bound = self.calculate_grade_ratio_bound(grade)
+            if bound is not None:
+                candidates.append((bound, position, grade))
+        for position, macro_grade in enumerate(possible_macro_grades, len(possible_transitions)):
+            bound = self.calculate_macro_grade_ratio_bound(macro_grade)
+            if bound is not None:
+                candidates.append((bound, position, macro_grade))
+        candidates.sort(key=lambda z: (-z[0], z[1]))
+        random_order = self.n_sample_grades is not None and self.grade_sampling == 'random'
+        if random_order:
+            candidates = [candidates[i] for i in self.random_state.permutation(len(candidates))]
+
+        best_solution = {}
+        best_position = None
+        n_solutions = 0
+        evaluated = []
+        for bound, position, grade in candidates:
+            if best_solution and bound + RATIO_BOUND_TOL * (1 + abs(bound)) < best_solution['ratio']:
+                if random_order:
+                    continue
+                break
+            if n_solutions == self.n_sample_grades:
+                break
+
+            if isinstance(grade, tuple):
+                solution = self.calculate_best_macro_grade_solution(
+                    actual_grade, grade, time_max, best_solution.get('ratio', -math.inf))
+            else:
+                solution = self.calculate_best_single_grade_solution(actual_grade, grade, time_max)
+            if solution is None:
+                continue
+            n_solutions += 1
+            evaluated.append((solution['grade'], solution['ratio']))
+
+            if best_solution and (solution['ratio'] < best_solution['ratio'] or (
+                    solution['ratio'] == best_solution['ratio'] and position > best_position)):
+                continue
+            best_solution = solution
+            best_position = position
+        if best_solution:
+            best_solution['candidates'] = evaluated
         return best_solution
 
     def update_restrictions_times(self, grade, grade_change, order_time_group):
@@ -184,16 +401,17 @@ class UnitGreedySimpleGroup:
 
     def update_plans(self, grade, orders_group, grade_change):
         if grade_change:
-            self.grades_plan.append((grade, self.time))
+            self.grades_plan.append(self.unit, grade, self.time)
         init_time = self.time
-        for (order_id, ratio, order_time, benefit, revenue) in orders_group:
+        for (order_index, ratio, order_time, benefit, revenue) in orders_group:
             end_time = init_time + order_time
             self.orders_plan.append(
-                (order_id, grade, init_time,
-                 end_time, benefit, revenue)
+                self.unit, self.orders_state.order_ids[order_index], grade, init_time,
+                end_time, benefit, revenue
             )
-            self.orders_completed.add(order_id)
             init_time = end_time
+        self.orders_state.complete(
+            [order_index for (order_index, _, _, _, _) in orders_group])
 
     def update_stocks(self, grade_change):
         if grade_change and self.actual_grade != -1:
@@ -210,33 +428,110 @@ class UnitGreedySimpleGroup:
                 self.stocks[self.actual_grade] += stock_tons
                 self.time = math.ceil(self.time)
 
-    def obtain_best_solution(self):
+    def calculate_candidates(self, start_time):
+        """
+        returns the possible grades and macro grades at start_time. With macro_grades the grades
+        inside forced chains are only candidates through their chain.
+        """
         if self.time_left_grade_change > 0 and self.actual_grade != -1:
-            possible_transitions = [self.actual_grade]
-        else:
-            possible_transitions = self.plant.calculate_possible_transitions(
-                self.time, self.unit, self.actual_grade)
-        best_solution = self.calculate_best_grade_solution(
-            self.actual_grade, possible_transitions)
-        return best_solution
+            return [self.actual_grade], []
+        possible_transitions = self.plant.calculate_possible_transitions(
+            start_time, self.unit, self.actual_grade)
+        if not self.macro_grades:
+            return possible_transitions, []
+        macro_grade_index = self.plant.macro_grade_index
+        possible_transitions = [grade for grade in possible_transitions
+                                if grade == self.actual_grade or macro_grade_index[grade] == -1]
+        possible_macro_grades = self.plant.calculate_possible_macro_grades(
+            start_time, self.unit, self.actual_grade)
+        return possible_transitions, possible_macro_grades
+
+    def obtain_best_solution(self):
+        """
+        Best solution in the first free gap between maintenance stops where any order group fits,
+        'start_time' is the end of the stops skipped.
+        """
+        start_time, end_time = self.maintenance.free_gap(self.unit, self.time)
+        while True:
+            possible_transitions, possible_macro_grades = self.calculate_candidates(start_time)
+            best_solution = self.calculate_best_grade_solution(
+                self.actual_grade, possible_transitions, end_time - start_time, possible_macro_grades)
+            if best_solution:
+                best_solution['start_time'] = start_time
+                return best_solution
+            if end_time >= self.horizon:
+                break
+            start_time, end_time = self.maintenance.free_gap(self.unit, end_time)
+        return {}
+
+    def calculate_n_fitting_solutions(self, solutions):
+        """
+        returns how many of solutions can be added one after the other from the unit state,
+        like update_with_solution without changing the state
+        """
+        state, complete = self.get_state(), self.complete
+        n_solutions = 0
+        for solution in solutions:
+            grade_change = (solution['grade'] != self.actual_grade)
+            self.time = solution.get('start_time', self.time)
+            self.update_stocks(grade_change)
+            start_time, end_time = self.maintenance.free_gap(self.unit, self.time)
+            if self.time >= self.horizon or start_time != self.time or \
+                    start_time + solution['order_time'] > end_time + GAP_TOL:
+                break
+            self.time += solution['order_time']
+            self.actual_grade = solution['grade']
+            n_solutions += 1
+        self.set_state(state)
+        self.complete = complete
+        return n_solutions
+
+    def split_solution(self, best_solution):
+        """
+        returns the solutions to add one after the other: for a profitable macro grade solution,
+        the grades of the longest part of the chain that fits before the next maintenance stop and
+        the horizon and is profitable, so a chain cut short never leaves a loss-making grade.
+        If no part qualifies, its first grade alone, checked like any other solution.
+        """
+        if 'chain' not in best_solution or best_solution['benefit'] < 0:
+            return [best_solution]
+        solutions = list(best_solution['chain'])
+        if 'start_time' in best_solution:
+            solutions[0] = dict(solutions[0], start_time=best_solution['start_time'])
+        n_solutions = self.calculate_n_fitting_solutions(solutions)
+        benefits = np.cumsum([solution['benefit'] for solution in solutions[:n_solutions]])
+        n_solutions = max([n + 1 for n, benefit in enumerate(benefits) if benefit >= 0], default=0)
+        if n_solutions == 0:
+            return [{key: value for key, value in solutions[0].items() if key != 'chained'}]
+        return solutions[:n_solutions]
 
     def update_with_solution(self, best_solution):
+        """
+        returns True if the solution was added to the plans.
+        Macro grade solutions are added with split_solution, grade by grade.
+        """
 
         grade = best_solution['grade']
         orders_group = best_solution['orders_group']
         order_time_group = best_solution['order_time']
         benefit_group = best_solution['benefit']
 
-        if benefit_group < 0:
+        if benefit_group < 0 and not best_solution.get('chained'):
             print(f'No more profitable orders, time={self.time}')
             self.complete = True
-            return
+            return False
 
         grade_change = (grade != self.actual_grade)
+        self.time = best_solution.get('start_time', self.time)
         self.update_stocks(grade_change)
         if self.time >= self.horizon:
             self.complete = True
-            return
+            return False
+        start_time, end_time = self.maintenance.free_gap(self.unit, self.time)
+        if start_time != self.time or start_time + order_time_group > end_time + GAP_TOL:
+            # minimum stock production reached a maintenance stop, search again after it
+            self.time = start_time
+            return False
         self.update_restrictions_times(grade, grade_change, order_time_group)
         self.update_plans(grade, orders_group, grade_change)
 
@@ -244,40 +539,20 @@ class UnitGreedySimpleGroup:
         self.actual_grade = grade
         if self.is_initial:
             self.is_initial = False
+        return True
 
     def find_planification(self):
 
-        self.actual_grade = -1  # initial
-        self.time = 0
-        while self.time < self.horizon:
+        while self.time < self.horizon and not self.complete:
 
             best_solution = self.obtain_best_solution()
             if not best_solution:
                 print(f'No more orders, time={self.time}')
                 break
 
-            grade = best_solution['grade']
-            orders_group = best_solution['orders_group']
-            order_time_group = best_solution['order_time']
-            benefit_group = best_solution['benefit']
-            revenue_group = best_solution['revenue']
-
-            if benefit_group < 0:
-                print(f'No more profitable orders, time={self.time}')
-                break
-
-            grade_change = (grade != self.actual_grade)
-
-            self.update_stocks(grade_change)
-            if self.time >= self.horizon:
-                break
-            self.update_restrictions_times(grade, grade_change, order_time_group)
-            self.update_plans(grade, orders_group, grade_change)
-
-            self.time += order_time_group
-            self.actual_grade = grade
-            if self.is_initial:
-                self.is_initial = False
+            for solution in self.split_solution(best_solution):
+                if not self.update_with_solution(solution):
+                    break
 
         self.complete = True
 
@@ -287,26 +562,27 @@ class PlantGreedySimpleGroup:
             self,
             plant: "Plant",
             horizon: int = 30 * 24,
-            # TODO: Maintenance stops
+            maintenance: MaintenanceCalendar = None,
     ):
         self.plant = plant
         self.horizon = horizon
+        self.maintenance = maintenance
         self.orders_completed = set()
         self.stocks = np.zeros(plant.n_grades)
 
     def find_planification(self):
-        orders_plan = {}
-        grades_plan = {}
+        orders_plan = OrdersPlan(self.plant.n_units)
+        grades_plan = GradesPlan(self.plant.n_units)
+        orders_state = OrdersState(self.plant.orders['firm'], self.plant.n_grades)
         for unit in range(self.plant.n_units):
             model = UnitGreedySimpleGroup(
-                plant=self.plant, unit=unit, orders_completed=self.orders_completed
+                plant=self.plant, unit=unit, horizon=self.horizon, orders_state=orders_state,
+                maintenance=self.maintenance, orders_plan=orders_plan, grades_plan=grades_plan
             )
             model.find_planification()
-            self.orders_completed.update(model.orders_completed)
             self.stocks += model.stocks
-            orders_plan[unit] = model.orders_plan
-            grades_plan[unit] = model.grades_plan
 
+        self.orders_completed = orders_state.completed_ids()
         return orders_plan, grades_plan, self.orders_completed, self.stocks
 
 
@@ -315,58 +591,243 @@ class PlantGreedyGroup:
             self,
             plant: "Plant",
             horizon: int = 30 * 24,
-            # TODO: Maintenance stops
+            orders: Dict[str, OrderItem] = None,
+            unit_states: Dict[int, dict] = None,
+            maintenance: MaintenanceCalendar = None,
+            record_trace: bool = False,
+            top_k_orders: int = None,
+            n_sample_grades: int = None,
+            grade_sampling: str = 'bound',
+            seed: int = None,
+            vectorized: bool = False,
+            macro_grades: bool = False,
     ):
+        """
+        orders: firm orders to plan, plant.orders['firm'] by default
+        unit_states: unit -> state (UnitGreedySimpleGroup.get_state) to start from,
+            plans start at time 0 with no grade by default
+        maintenance: maintenance stops, plant.maintenance by default
+        record_trace: record every decision in self.trace (GreedyTrace)
+        top_k_orders, n_sample_grades, grade_sampling: approximate mode of the unit models
+            (UnitGreedySimpleGroup), exact by default
+        seed: seed of the random generator shared by the unit models
+        vectorized: score the grades of all the units at once in every step (CandidateScoring),
+            same solution as the unit models, only with the exact greedy
+        macro_grades: evaluate the forced chains of plant.macro_grades as single candidates
+        """
+        if vectorized and (top_k_orders is not None or n_sample_grades is not None):
+            raise ValueError('vectorized scoring is only available for the exact greedy')
         self.plant = plant
         self.horizon = horizon
+        self.orders = orders
+        self.unit_states = dict(unit_states or {})
+        self.maintenance = maintenance
+        self.record_trace = record_trace
+        self.top_k_orders = top_k_orders
+        self.n_sample_grades = n_sample_grades
+        self.grade_sampling = grade_sampling
+        self.seed = seed
+        self.vectorized = vectorized
+        self.macro_grades = macro_grades
+        self.trace = None
         self.orders_completed = set()
         self.stocks = np.zeros(plant.n_grades)
 
     @staticmethod
-    def obtain_plant_best_solution(unit_models):
+    def obtain_plant_solutions(unit_models):
         plant_solutions = [
             (unit, model.obtain_best_solution()) for unit, model in unit_models.items()
             if not model.complete
         ]
-        plant_solutions = [(unit, solution)
-                           for unit, solution in plant_solutions
-                           if solution]
+        return [(unit, solution)
+                for unit, solution in plant_solutions
+                if solution]
+
+    @staticmethod
+    def obtain_plant_best_solution(unit_models):
+        plant_solutions = PlantGreedyGroup.obtain_plant_solutions(unit_models)
         if not plant_solutions:
             return None
         unit, best_solution = max(plant_solutions, key=lambda z: z[1]['ratio'])
         return unit, best_solution
 
+    @staticmethod
+    def calculate_scored_best_solution(model, grades, bounds, ratios, possible_macro_grades, time_max):
+        """
+        calculate_best_grade_solution of model with the ratios of the single grades already scored
+        grades, bounds: candidate grades with remaining orders and their ratio bounds, by decreasing bound
+        ratios: n_grades np.array, ratio of the best order group of every grade, -inf without group
+        """
+        candidates = list(zip(bounds, grades, grades))
+        for position, macro_grade in enumerate(possible_macro_grades, model.plant.n_grades):
+            bound = model.calculate_macro_grade_ratio_bound(macro_grade)
+            if bound is not None:
+                candidates.append((bound, position, macro_grade))
+        candidates.sort(key=lambda z: (-z[0], z[1]))
+
+        best_solution = {}
+        best_position = None
+        evaluated = []
+        for bound, position, grade in candidates:
+            if best_solution and bound + RATIO_BOUND_TOL * (1 + abs(bound)) < best_solution['ratio']:
+                break
+            if isinstance(grade, tuple):
+                solution = model.calculate_best_macro_grade_solution(
+                    model.actual_grade, grade, time_max, best_solution.get('ratio', -math.inf))
+            else:
+                solution = {'ratio': ratios[grade], 'grade': grade} if ratios[grade] > -np.inf else None
+            if solution is None:
+                continue
+            evaluated.append((solution['grade'], solution['ratio']))
+            if best_solution and (solution['ratio'] < best_solution['ratio'] or (
+                    solution['ratio'] == best_solution['ratio'] and position > best_position)):
+                continue
+            best_solution = solution
+            best_position = position
+        if best_solution:
+            best_solution['candidates'] = evaluated
+        return best_solution
+
+    @staticmethod
+    def obtain_scored_plant_solutions(unit_models, scoring):
+        """
+        Like obtain_plant_best_solution, with the grades of all the units scored at once by
+        scoring (CandidateScoring). Candidates are visited like calculate_best_grade_solution, by
+        decreasing ratio bound until the bound falls below the best ratio, so the evaluated
+        candidates are the same ones. Macro grades, the order group of the best grade and units
+        without candidates in their first free gap are solved by the unit models.
+        returns [(unit, solution)], only with 'ratio', 'grade' and 'candidates' for scored grades,
+        and the best (unit, solution), None if there are no solutions
+        """
+        plant = scoring.plant
+        units = [unit for unit, model in unit_models.items() if not model.complete]
+        models = [unit_models[unit] for unit in units]
+        gaps = [model.maintenance.free_gap(model.unit, model.time) for model in models]
+        start_times = np.array([start_time for start_time, _ in gaps], dtype=float)
+        time_max = np.array([end_time - start_time for start_time, end_time in gaps], dtype=float)
+        actual_grades = np.array([model.actual_grade for model in models], dtype=int)
+        time_left_grade_change = np.array([model.time_left_grade_change for model in models], dtype=float)
+
+        # calculate_candidates of all the units
+        mask = plant.calculate_possible_transitions_masks(start_times, units, actual_grades)
+        forced = (time_left_grade_change > 0) & (actual_grades != -1)
+        mask[forced] = False
+        mask[forced, actual_grades[forced]] = True
+        possible_macro_grades = [[] for _ in models]
+        macro_rows = [i for i, model in enumerate(models) if model.macro_grades and not forced[i]]
+        if macro_rows:
+            mask[macro_rows] &= plant.macro_grade_index[None, :] == -1
+            for i in macro_rows:
+                if actual_grades[i] != -1:
+                    mask[i, actual_grades[i]] = True
+                possible_macro_grades[i] = plant.calculate_possible_macro_grades(
+                    start_times[i], units[i], actual_grades[i])
+
+        ratios = scoring.calculate_ratios(
+            units, actual_grades, np.array([model.time_reg_left for model in models], dtype=float),
+            time_left_grade_change, time_max, mask
+        )
+        # grades by decreasing bound, then grade, and the ones evaluated before the bound pruning
+        bounds = np.where(mask, scoring.calculate_ratio_bounds(units), -np.inf)
+        is_candidate = bounds > -np.inf
+        visit = np.lexsort((np.broadcast_to(np.arange(plant.n_grades), mask.shape), -bounds), axis=-1)
+        visit_bounds = np.take_along_axis(np.where(is_candidate, bounds, 0), visit, axis=1)
+        visit_ratios = np.take_along_axis(np.where(is_candidate, ratios, -np.inf), visit, axis=1)
+        previous_best = np.maximum.accumulate(
+            np.concatenate([np.full((len(units), 1), -np.inf), visit_ratios[:, :-1]], axis=1), axis=1)
+        pruned = np.logical_or.accumulate(
+            visit_bounds + RATIO_BOUND_TOL * (1 + np.abs(visit_bounds)) < previous_best, axis=1)
+        evaluated = np.take_along_axis(is_candidate, visit, axis=1) & ~pruned & (visit_ratios > -np.inf)
+
+        plant_solutions = []
+        for i, (unit, model) in enumerate(zip(units, models)):
+            if possible_macro_grades[i]:
+                candidates = visit[i][np.take_along_axis(is_candidate[i], visit[i], axis=0)]
+                solution = PlantGreedyGroup.calculate_scored_best_solution(
+                    model, candidates.tolist(), bounds[i, candidates].tolist(), ratios[i],
+                    possible_macro_grades[i], time_max[i])
+            else:
+                # pruned grades are below the best ratio, the best grade is the best scored one
+                grade = int(np.argmax(ratios[i]))
+                solution = {'ratio': ratios[i, grade], 'grade': grade} if ratios[i, grade] > -np.inf else {}
+                if solution:
+                    solution['candidates'] = list(zip(visit[i, evaluated[i]].tolist(),
+                                                      visit_ratios[i, evaluated[i]].tolist()))
+            if solution:
+                solution['start_time'] = gaps[i][0]
+            else:
+                solution = model.obtain_best_solution()
+            if solution:
+                plant_solutions.append((unit, solution))
+
+        if not plant_solutions:
+            return plant_solutions, None
+        unit, best_solution = max(plant_solutions, key=lambda z: z[1]['ratio'])
+        if 'orders_group' not in best_solution:
+            grade = best_solution['grade']
+            (ratio, order_time, benefit, revenue), orders_group = scoring.calculate_order_group(unit, grade)
+            best_solution = {
+                'orders_group': orders_group,
+                'ratio': ratio,
+                'order_time': order_time,
+                'grade': grade,
+                'benefit': benefit,
+                'revenue': revenue,
+                'start_time': best_solution['start_time']
+            }
+        return plant_solutions, (unit, best_solution)
+
     def find_planification(self):
-        orders_plan = {}
-        grades_plan = {}
+        orders_plan = OrdersPlan(self.plant.n_units)
+        grades_plan = GradesPlan(self.plant.n_units)
 
+        orders = self.plant.orders['firm'] if self.orders is None else self.orders
+        # single orders state shared by reference with every unit model
+        orders_state = OrdersState(orders, self.plant.n_grades)
+        random_state = np.random.RandomState(self.seed)
         unit_models = {}
         for unit in range(self.plant.n_units):
             model = UnitGreedySimpleGroup(
-                plant=self.plant, unit=unit, orders_completed=self.orders_completed
+                plant=self.plant, unit=unit, horizon=self.horizon, orders_state=orders_state,
+                maintenance=self.maintenance, orders_plan=orders_plan, grades_plan=grades_plan,
+                top_k_orders=self.top_k_orders, n_sample_grades=self.n_sample_grades,
+                grade_sampling=self.grade_sampling, random_state=random_state,
+                macro_grades=self.macro_grades
             )
+            if unit in self.unit_states:
+                model.set_state(self.unit_states[unit])
             unit_models[unit] = model
+        if self.record_trace:
+            self.trace = GreedyTrace(self.plant.n_units, len(orders_state), self.horizon)
+        scoring = CandidateScoring(self.plant, orders_state) if self.vectorized else None
 
         while not all(model.complete for unit, model in unit_models.items()):
 
-            plant_best_solution = PlantGreedyGroup.obtain_plant_best_solution(unit_models)
-            if not plant_best_solution:
+            if scoring is None:
+                plant_solutions = PlantGreedyGroup.obtain_plant_solutions(unit_models)
+            else:
+                plant_solutions, plant_best_solution = PlantGreedyGroup.obtain_scored_plant_solutions(
+                    unit_models, scoring)
+            if not plant_solutions:
                 print(f'No more orders')
                 break
 
-            unit, best_solution = plant_best_solution
-            unit_models[unit].update_with_solution(best_solution)
-
-            # update new completed orders
-            orders_group = best_solution['orders_group']
-            new_orders = {order_id for (order_id, _, _, _, _) in orders_group}
-            for unit, model in unit_models.items():
-                model.update_orders_completed(new_orders)
+            if scoring is None:
+                unit, best_solution = max(plant_solutions, key=lambda z: z[1]['ratio'])
+            else:
+                unit, best_solution = plant_best_solution
+            for solution in unit_models[unit].split_solution(best_solution):
+                committed = unit_models[unit].update_with_solution(solution)
+                if self.trace is not None:
+                    self.trace.record(unit_models[unit], solution, plant_solutions, committed)
+                if not committed:
+                    break
 
         for unit, model in unit_models.items():
-            self.orders_completed.update(model.orders_completed)
             self.stocks += model.stocks
-            orders_plan[unit] = model.orders_plan
-            grades_plan[unit] = model.grades_plan
+            self.unit_states[unit] = model.get_state()
+        if self.trace is not None:
+            self.trace.stocks = self.stocks.copy()
 
+        self.orders_completed = orders_state.completed_ids()
         return orders_plan, grades_plan, self.orders_completed, self.stocks
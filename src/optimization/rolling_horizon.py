@@ -0,0 +1,140 @@
+import math
+import numpy as np
+from collections import deque
+from typing import Dict
+from ..plant import Plant, OrderItem
+from ..maintenance import MaintenanceCalendar
+from ..plan import OrdersPlan, GradesPlan
+from .greedy_simple_group import PlantGreedyGroup
+
+
+class PlantRollingHorizon:
+    """
+    Solve long horizons as a sequence of windows with PlantGreedyGroup.
+
+    Every window plans from the unit states (time, grade, transition and stock counters)
+    left by the previous one, with an order pool per unit sized for window + overlap hours of
+    production in the unit, so time and memory grow linearly with the horizon. Pools are
+    refilled from the orders that each unit can produce, ranked by their ratio in the unit.
+    Orders not planned in all the windows that a pool covers go back to the end of the ranking.
+
+    The overlap only sizes the order pool, so each window chooses among more orders than it
+    can produce. Windows are planned up to their end and never solved again: the end of a
+    window is not re-planned together with the start of the next one.
+    """
+    def __init__(
+            self,
+            plant: "Plant",
+            horizon: int = 30 * 24,
+            window: int = 10 * 24,
+            overlap: int = 30 * 24,
+            maintenance: MaintenanceCalendar = None,
+    ):
+        """
+        window: hours planned in each window
+        overlap: extra hours of production covered by the order pool of every unit,
+            the planned windows are not re-planned
+        maintenance: maintenance stops, plant.maintenance by default
+        """
+        self.plant = plant
+        self.horizon = horizon
+        self.window = window
+        self.overlap = overlap
+        self.maintenance = maintenance
+        self.orders_completed = set()
+        self.stocks = np.zeros(plant.n_grades)
+
+    def rank_orders(self, orders: Dict[str, OrderItem]):
+        """
+        returns {unit: deque of (order_id, time)}, the orders that every unit can produce sorted by
+        decreasing unpenalized ratio in the unit, times are the production hours in the unit
+        """
+        order_ids = list(orders.keys())
+        if not order_ids:
+            return {unit: deque() for unit in range(self.plant.n_units)}
+        grade, tons, price, _ = np.array([orders[order_id] for order_id in order_ids]).T
+        grade = grade.astype(int)
+        prod_flow = self.plant.prod_flow[grade]
+        ratios = price[:, None] * prod_flow / tons[:, None] - self.plant.man_cost[grade]
+        times = tons[:, None] / prod_flow
+        # unique grades can only be produced in unique unit
+        unique_orders = np.isin(grade, list(self.plant.unique_grades))
+        queues = {}
+        for unit in range(self.plant.n_units):
+            idx = np.argsort(-ratios[:, unit], kind='stable')
+            if unit != self.plant.unique_unit:
+                idx = idx[~unique_orders[idx]]
+            queues[unit] = deque(zip([order_ids[i] for i in idx], times[idx, unit].tolist()))
+        return queues
+
+    @staticmethod
+    def select_window_orders(queue, pool, capacity, orders_completed, pooled):
+        """
+        Refill the pool of a unit (order_id -> time in the unit) with the orders of its queue
+        until its production time reaches capacity. Orders in pooled are already in a pool,
+        so every order counts in a single unit. returns the order ids added.
+        """
+        pool_time = sum(pool.values())
+        added = []
+        while queue and pool_time < capacity:
+            order_id, time = queue.popleft()
+            if order_id not in orders_completed and order_id not in pooled:
+                pool[order_id] = time
+                pool_time += time
+                added.append(order_id)
+        return added
+
+    def find_planification(self):
+        orders = self.plant.orders['firm']
+        queues = self.rank_orders(orders)
+        pools = {unit: {} for unit in range(self.plant.n_units)}
+        # windows planned by every order of the pools without being completed
+        unplanned_windows = {}
+
+        orders_plan = OrdersPlan(self.plant.n_units)
+        grades_plan = GradesPlan(self.plant.n_units)
+        unit_states = {}
+        capacity = self.window + self.overlap
+        # windows that the pools cover, orders not planned in all of them are not kept
+        max_windows = math.ceil(capacity / self.window)
+
+        window_start = 0
+        while window_start < self.horizon:
+            window_end = min(window_start + self.window, self.horizon)
+            window_ids = {order_id for pool in pools.values() for order_id in pool}
+            for unit, pool in pools.items():
+                window_ids.update(self.select_window_orders(
+                    queues[unit], pool, capacity, self.orders_completed, window_ids))
+            if not window_ids:
+                break
+            model = PlantGreedyGroup(
+                plant=self.plant,
+                horizon=window_end,
+                orders={order_id: orders[order_id] for order_id in window_ids},
+                unit_states=unit_states,
+                maintenance=self.maintenance,
+            )
+            window_orders_plan, window_grades_plan, window_completed, _ = model.find_planification()
+            unit_states = model.unit_states
+            orders_plan.extend(window_orders_plan)
+            grades_plan.extend(window_grades_plan)
+            self.orders_completed.update(window_completed)
+
+            # orders not planned in the windows of their pool go back to the end of the queue,
+            # so they don't keep the place of other orders in the pools
+            for order_id in window_ids - set(window_completed):
+                unplanned_windows[order_id] = unplanned_windows.get(order_id, 0) + 1
+            for unit, pool in pools.items():
+                for order_id in list(pool):
+                    if order_id in self.orders_completed:
+                        del pool[order_id]
+                        unplanned_windows.pop(order_id, None)
+                    elif unplanned_windows[order_id] >= max_windows:
+                        queues[unit].append((order_id, pool.pop(order_id)))
+                        del unplanned_windows[order_id]
+            window_start = window_end
+
+        for unit, state in unit_states.items():
+            self.stocks += state['stocks']
+
+        return orders_plan, grades_plan, self.orders_completed, self.stocks
@@ -0,0 +1,201 @@
+import numpy as np
+from ..plant import Plant
+from ..orders import OrdersState
+
+
+class CandidateScoring:
+    """
+    Ratio of the best order group of every (unit, grade) candidate of a greedy step,
+    in vectorized passes over the remaining orders of all the units.
+
+    Groups are built like UnitGreedySimpleGroup.calculate_best_grade_order_group, all of them
+    at the same time: every iteration adds the best order to the groups that have not covered
+    their minimum time yet, so the ratios are the ones of the unit models.
+    Ratios are kept between steps, only the units whose state changed and the grades
+    with new completed orders are scored again. The remaining orders of every grade are also
+    kept, completed orders are dropped from them when OrdersState reports new ones.
+    """
+    def __init__(self, plant: Plant, orders_state: OrdersState):
+        self.plant = plant
+        self.orders_state = orders_state
+        # orders by grade and decreasing price per ton, like OrdersState.grade2orders
+        self.order = np.lexsort((-orders_state.price_per_ton, orders_state.grades))
+        self.grades = orders_state.grades[self.order]
+        self.prices = orders_state.prices[self.order]
+        self.price_per_ton = orders_state.price_per_ton[self.order]
+        # n_units x n_orders, production time and cost of every order in every unit
+        self.times = orders_state.tons[self.order] / plant.prod_flow[self.grades].T
+        self.costs = plant.man_cost[self.grades].T * self.times
+        # positions of the remaining orders in the sorted orders and first one of every grade
+        self.live = np.arange(len(self.order))
+        self.live_bounds = np.searchsorted(self.grades, np.arange(plant.n_grades + 1))
+        self.remaining = np.full(plant.n_grades, -1)
+
+        self.ratios = np.full((plant.n_units, plant.n_grades), -np.inf)
+        self.group_time = np.zeros((plant.n_units, plant.n_grades))
+        self.group_benefit = np.zeros((plant.n_units, plant.n_grades))
+        self.group_revenue = np.zeros((plant.n_units, plant.n_grades))
+        # picks of every scoring pass, and the pass of the group of every (unit, grade)
+        self.picks = {}
+        self.generations = np.full((plant.n_units, plant.n_grades), -1)
+        self.n_generations = 0
+        self.unit_states = [None] * plant.n_units
+
+    def update_remaining_orders(self):
+        """
+        drops the completed orders from the remaining orders
+        returns np.array (bool), grades with new completed orders
+        """
+        changed = self.orders_state.remaining != self.remaining
+        if changed.any():
+            self.remaining = self.orders_state.remaining.copy()
+            self.live = self.live[~self.orders_state.completed[self.order[self.live]]]
+            self.live_bounds = np.searchsorted(self.grades[self.live], np.arange(self.plant.n_grades + 1))
+        return changed
+
+    def calculate_ratio_bounds(self, units):
+        """
+        like UnitGreedySimpleGroup.calculate_grade_ratio_bound for every grade of units,
+        -inf for grades without remaining orders
+        """
+        starts = self.live_bounds[:-1]
+        has_orders = self.live_bounds[1:] > starts
+        best_price_per_ton = np.zeros(self.plant.n_grades)
+        best_price_per_ton[has_orders] = self.price_per_ton[self.live[starts[has_orders]]]
+        bounds = np.maximum(
+            best_price_per_ton[None, :] * self.plant.prod_flow.T[units] - self.plant.man_cost.T[units], 0)
+        bounds[:, ~has_orders] = -np.inf
+        return bounds
+
+    def calculate_ratios(self, units, actual_grades, time_reg_left, time_left_grade_change, time_max, mask):
+        """
+        units: units to score
+        actual_grades, time_reg_left, time_left_grade_change: np.arrays, state of the units
+        time_max: np.array, time until the next maintenance stop of every unit
+        mask: len(units) x n_grades np.array (bool), candidate grades of every unit
+        returns len(units) x n_grades np.array with the ratio of the best order group, -inf without group
+        """
+        units = np.asarray(units, dtype=int)
+        changed = np.zeros(mask.shape, dtype=bool)
+        changed[:, self.update_remaining_orders()] = True
+        for i, unit in enumerate(units.tolist()):
+            state = (actual_grades[i], time_reg_left[i], time_left_grade_change[i], time_max[i], mask[i].tobytes())
+            if state != self.unit_states[unit]:
+                self.unit_states[unit] = state
+                changed[i] = True
+
+        rows, grades = np.nonzero(changed)
+        if len(rows):
+            changed_units = units[rows]
+            self.ratios[changed_units, grades] = -np.inf
+            self.generations[changed_units, grades] = -1
+            cell_rows, cell_grades, ratios, group_time, group_benefit, group_revenue, picks = \
+                self.calculate_group_ratios(units, actual_grades, time_reg_left, time_left_grade_change,
+                                            time_max, changed & mask)
+            cell_units = units[cell_rows]
+            self.ratios[cell_units, cell_grades] = ratios
+            self.group_time[cell_units, cell_grades] = group_time
+            self.group_benefit[cell_units, cell_grades] = group_benefit
+            self.group_revenue[cell_units, cell_grades] = group_revenue
+            self.generations[cell_units, cell_grades] = self.n_generations
+            pick_cells, *pick_data = picks
+            self.picks[self.n_generations] = [cell_units[pick_cells], cell_grades[pick_cells]] + pick_data
+            self.n_generations += 1
+            for generation in set(self.picks) - set(np.unique(self.generations).tolist()):
+                del self.picks[generation]
+        return self.ratios[units]
+
+    def calculate_group_ratios(self, units, actual_grades, time_reg_left, time_left_grade_change, time_max, mask):
+        """
+        best order groups of the (unit, grade) candidates of mask, without cache
+        returns the rows and grades of the candidates with a group, their ratio, time, benefit
+        and revenue, and the picks: candidate of every added order and
+        (order index, ratio, time, benefit, revenue) of the orders, in the order they were added
+        """
+        n_rows, n_grades = mask.shape
+        grade_change = np.arange(n_grades)[None, :] != actual_grades[:, None]
+        # actual_grade = -1 uses the last row of t_transition, like the unit models
+        t_reg = np.where(grade_change, self.plant.t_transition[actual_grades], time_reg_left[:, None])
+        time_left = np.where(grade_change, self.plant.t_min[None, :], time_left_grade_change[:, None])
+        n_live = np.diff(self.live_bounds)
+        active = mask & ~(grade_change & (time_left > time_max[:, None])) & (n_live > 0)[None, :]
+
+        # (candidate, order) pairs, the remaining orders of its grade for every candidate
+        cell_rows, cell_grades = np.nonzero(active)
+        n_cells = len(cell_rows)
+        cell_counts = n_live[cell_grades]
+        pair_cells = np.repeat(np.arange(n_cells), cell_counts)
+        offsets = np.arange(len(pair_cells)) - np.repeat(np.cumsum(cell_counts) - cell_counts, cell_counts)
+        pair_orders = self.live[self.live_bounds[cell_grades][pair_cells] + offsets]
+        pair_units = units[cell_rows][pair_cells]
+        pair_times = self.times[pair_units, pair_orders]
+        pair_costs = self.costs[pair_units, pair_orders]
+        pair_prices = self.prices[pair_orders]
+        done = np.zeros(len(pair_cells), dtype=bool)
+
+        cell_t_reg = t_reg[cell_rows, cell_grades]
+        cell_time_left = time_left[cell_rows, cell_grades]
+        cell_time_max = time_max[cell_rows]
+        group_time = np.zeros(n_cells)
+        group_benefit = np.zeros(n_cells)
+        group_revenue = np.zeros(n_cells)
+        has_group = np.zeros(n_cells, dtype=bool)
+        picks = [(np.zeros(0, dtype=int), np.zeros(0, dtype=int)) + (np.zeros(0),) * 4]
+        while len(pair_cells):
+            time_low = np.minimum(cell_t_reg[pair_cells], pair_times)
+            time_normal = pair_times - time_low
+            price_reduction = self.plant.gamma * (time_low / pair_times) + (time_normal / pair_times)
+            revenues = pair_prices * price_reduction
+            benefits = revenues - pair_costs
+            order_ratios = benefits / pair_times
+            valid = ~done & (pair_times <= cell_time_max[pair_cells] - group_time[pair_cells])
+            valid_ratios = np.where(valid, order_ratios, -np.inf)
+
+            # first order with the best ratio of every candidate
+            segment_starts = np.concatenate(([0], np.flatnonzero(pair_cells[1:] != pair_cells[:-1]) + 1))
+            segment_sizes = np.diff(np.append(segment_starts, len(pair_cells)))
+            best_ratios = np.maximum.reduceat(valid_ratios, segment_starts)
+            is_best = valid & (valid_ratios == np.repeat(best_ratios, segment_sizes))
+            first = np.minimum.reduceat(
+                np.where(is_best, np.arange(len(pair_cells)), len(pair_cells)), segment_starts)
+            picked_pairs = first[first < len(pair_cells)]
+            if not len(picked_pairs):
+                break
+            picked = pair_cells[picked_pairs]
+
+            group_time[picked] += pair_times[picked_pairs]
+            group_benefit[picked] += benefits[picked_pairs]
+            group_revenue[picked] += revenues[picked_pairs]
+            picks.append((picked, self.order[pair_orders[picked_pairs]], order_ratios[picked_pairs],
+                          pair_times[picked_pairs], benefits[picked_pairs], revenues[picked_pairs]))
+            done[picked_pairs] = True
+            has_group[picked] = True
+            cell_t_reg[picked] = np.maximum(cell_t_reg[picked] - group_time[picked], 0)
+
+            # only the candidates that have not covered their minimum time keep adding orders
+            cell_active = np.zeros(n_cells, dtype=bool)
+            cell_active[picked] = group_time[picked] < cell_time_left[picked]
+            keep = cell_active[pair_cells]
+            pair_cells, pair_orders, pair_times, pair_costs, pair_prices, done = (
+                pair_cells[keep], pair_orders[keep], pair_times[keep], pair_costs[keep], pair_prices[keep],
+                done[keep])
+
+        group_time += np.maximum(0, np.minimum(cell_time_left, cell_time_max) - group_time)
+        picks = [np.concatenate(data) for data in zip(*picks)]
+        # candidates of the picks between the ones with a group
+        picks[0] = np.flatnonzero(has_group).searchsorted(picks[0])
+        return (cell_rows[has_group], cell_grades[has_group],
+                group_benefit[has_group] / group_time[has_group], group_time[has_group],
+                group_benefit[has_group], group_revenue[has_group], picks)
+
+    def calculate_order_group(self, unit, grade):
+        """
+        returns the best order group of (unit, grade) of the last calculate_ratios,
+        like calculate_best_grade_order_group: (ratio, time, benefit, revenue) and
+        [(order index, ratio, time, benefit, revenue)]
+        """
+        pick_units, pick_grades, *pick_data = self.picks[self.generations[unit, grade]]
+        selected = np.flatnonzero((pick_units == unit) & (pick_grades == grade))
+        group_data = (self.ratios[unit, grade], self.group_time[unit, grade],
+                      self.group_benefit[unit, grade], self.group_revenue[unit, grade])
+        return group_data, list(zip(*(data[selected].tolist() for data in pick_data)))
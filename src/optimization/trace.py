@@ -0,0 +1,225 @@
+import numpy as np
+from typing import List
+from ..plan import OrdersPlan, GradesPlan
+
+STEP_DTYPE = np.dtype([
+    ('unit', np.int16),
+    ('grade', np.int16),
+    ('committed', np.bool_),
+    ('time', np.float64),  # start time of the order group (unit time if not committed)
+    ('order_time', np.float64),
+    ('benefit', np.float64),
+    ('revenue', np.float64),
+    ('time_reg_left', np.float64),
+    ('time_left_grade_change', np.float64),
+    ('orders_start', np.int64),  # orders of the step are orders[orders_start:orders_end]
+    ('orders_end', np.int64),
+])
+
+CANDIDATE_DTYPE = np.dtype([
+    ('step', np.int32),
+    ('unit', np.int16),
+    ('grade', np.int16),  # first grade of macro grades
+    ('ratio', np.float64),
+])
+
+ORDER_DTYPE = np.dtype([
+    ('index', np.int32),  # order index in OrdersState
+    ('time', np.float64),
+    ('benefit', np.float64),
+    ('revenue', np.float64),
+])
+
+
+class GreedyTrace:
+    """
+    Compact record of every decision of PlantGreedyGroup.
+
+    ...
+    Attributes
+    ----------
+    steps: n_steps np.array (STEP_DTYPE)
+        chosen unit and grade, order group, and unit counters after the step
+    ratios: n_steps x n_units np.array (float)
+        best ratio of every unit in the step, nan if the unit had no solution
+    candidates: np.array (CANDIDATE_DTYPE)
+        ratio of every (unit, grade) candidate evaluated in the steps, the grades pruned
+        by their ratio bound are not evaluated
+    orders: np.array (ORDER_DTYPE)
+        orders committed in the steps
+    stocks: n_grades np.array (float)
+        plant stocks at the end of the planification
+    """
+    def __init__(self, n_units: int, n_orders: int = 0, horizon: int = 30 * 24):
+        self.n_units = n_units
+        self.n_orders = n_orders
+        self.horizon = horizon
+        self._steps = []
+        self._ratios = []
+        self._candidates = []
+        self._orders = []
+        self._arrays = None
+        self.stocks = np.zeros(0)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def record(self, model, solution, plant_solutions, committed):
+        """
+        model: UnitGreedySimpleGroup after update_with_solution(solution)
+        plant_solutions: [(unit, solution)] candidates of the step
+        committed: value returned by update_with_solution
+        """
+        ratios = [np.nan] * self.n_units
+        step = len(self._steps)
+        for unit, unit_solution in plant_solutions:
+            ratios[unit] = unit_solution['ratio']
+            self._candidates.extend(
+                (step, unit, grade, ratio) for grade, ratio in unit_solution.get('candidates', []))
+
+        orders_group = solution['orders_group']
+        orders_start = len(self._orders)
+        if committed:
+            time = model.orders_plan.array['start'][-len(orders_group)]
+            self._orders.extend(
+                (order_index, order_time, benefit, revenue)
+                for (order_index, _, order_time, benefit, revenue) in orders_group
+            )
+        else:
+            time = model.time
+
+        self._steps.append((
+            model.unit, solution['grade'], committed, time,
+            solution['order_time'], solution['benefit'], solution['revenue'],
+            model.time_reg_left, model.time_left_grade_change,
+            orders_start, len(self._orders),
+        ))
+        self._ratios.append(ratios)
+        self._arrays = None
+
+    def _build_arrays(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.array(self._steps, dtype=STEP_DTYPE),
+                np.array(self._ratios, dtype=np.float64).reshape(-1, self.n_units),
+                np.array(self._orders, dtype=ORDER_DTYPE),
+                np.array(self._candidates, dtype=CANDIDATE_DTYPE),
+            )
+        return self._arrays
+
+    @property
+    def steps(self):
+        return self._build_arrays()[0]
+
+    @property
+    def ratios(self):
+        return self._build_arrays()[1]
+
+    @property
+    def orders(self):
+        return self._build_arrays()[2]
+
+    @property
+    def candidates(self):
+        return self._build_arrays()[3]
+
+    def step_orders(self, step):
+        """
+        returns the order indices committed in step
+        """
+        step_data = self.steps[step]
+        return self.orders['index'][step_data['orders_start']:step_data['orders_end']]
+
+    def step_candidates(self, step):
+        """
+        returns the candidates evaluated in step, in the order they were evaluated
+        """
+        candidates = self.candidates
+        start, end = np.searchsorted(candidates['step'], [step, step + 1])
+        return candidates[start:end]
+
+    def save(self, file_path):
+        steps, ratios, orders, candidates = self._build_arrays()
+        with open(file_path, 'wb') as fp:
+            np.savez_compressed(
+                fp, steps=steps, ratios=ratios, orders=orders, candidates=candidates, stocks=self.stocks,
+                meta=np.array([self.n_units, self.n_orders, self.horizon])
+            )
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            n_units, n_orders, horizon = data['meta'].tolist()
+            trace = cls(n_units=n_units, n_orders=n_orders, horizon=horizon)
+            steps, ratios, orders = data['steps'], data['ratios'], data['orders']
+            candidates = data['candidates'] if 'candidates' in data.files else np.zeros(0, dtype=CANDIDATE_DTYPE)
+            trace._steps = steps.tolist()
+            trace._ratios = ratios.tolist()
+            trace._orders = orders.tolist()
+            trace._candidates = candidates.tolist()
+            trace._arrays = (steps, ratios, orders, candidates)
+            trace.stocks = data['stocks']
+        return trace
+
+    def replay(self, order_ids: List[str]):
+        """
+        Rebuild the plans from the committed steps, without evaluating any candidate.
+        order_ids: order index -> order_id of the orders of the traced planification
+        returns orders_plan, grades_plan, orders_completed, stocks like PlantGreedyGroup
+        """
+        if len(order_ids) != self.n_orders:
+            raise ValueError(f'Trace has {self.n_orders} orders, got {len(order_ids)} order ids')
+        steps, _, orders, _ = self._build_arrays()
+        orders_plan = OrdersPlan(self.n_units)
+        grades_plan = GradesPlan(self.n_units)
+        actual_grades = {unit: -1 for unit in range(self.n_units)}
+        orders_completed = set()
+        for step in steps[steps['committed']]:
+            unit, grade, time = int(step['unit']), int(step['grade']), step['time']
+            if grade != actual_grades[unit]:
+                grades_plan.append(unit, grade, time)
+                actual_grades[unit] = grade
+            init_time = time
+            for (order_index, order_time, benefit, revenue) in orders[step['orders_start']:step['orders_end']]:
+                end_time = init_time + order_time
+                order_id = order_ids[order_index]
+                orders_plan.append(unit, order_id, grade, init_time, end_time, benefit, revenue)
+                orders_completed.add(order_id)
+                init_time = end_time
+        return orders_plan, grades_plan, orders_completed, self.stocks.copy()
+
+    @staticmethod
+    def first_divergence(trace_a, trace_b, rtol=0.):
+        """
+        returns the first step where the decisions (unit, grade, committed orders, counters,
+        unit ratios or evaluated candidates) of the traces differ, None if they are equal.
+        rtol: relative tolerance for float comparisons
+        """
+        steps_a, steps_b = trace_a.steps, trace_b.steps
+        n_steps = min(len(steps_a), len(steps_b))
+        float_fields = ['time', 'order_time', 'benefit', 'revenue', 'time_reg_left', 'time_left_grade_change']
+        same = (steps_a['unit'][:n_steps] == steps_b['unit'][:n_steps]) & \
+               (steps_a['grade'][:n_steps] == steps_b['grade'][:n_steps]) & \
+               (steps_a['committed'][:n_steps] == steps_b['committed'][:n_steps])
+        for field in float_fields:
+            same &= np.isclose(steps_a[field][:n_steps], steps_b[field][:n_steps], rtol=rtol, atol=0)
+        if trace_a.n_units == trace_b.n_units:
+            same &= np.isclose(trace_a.ratios[:n_steps], trace_b.ratios[:n_steps],
+                               rtol=rtol, atol=0, equal_nan=True).all(axis=1)
+        else:
+            same[:] = False
+        for step in np.flatnonzero(same):
+            candidates_a, candidates_b = trace_a.step_candidates(step), trace_b.step_candidates(step)
+            if not np.array_equal(trace_a.step_orders(step), trace_b.step_orders(step)) or \
+                    len(candidates_a) != len(candidates_b) or \
+                    not np.array_equal(candidates_a['unit'], candidates_b['unit']) or \
+                    not np.array_equal(candidates_a['grade'], candidates_b['grade']) or \
+                    not np.isclose(candidates_a['ratio'], candidates_b['ratio'], rtol=rtol, atol=0).all():
+                same[step] = False
+                break
+        diverging = np.flatnonzero(~same)
+        if len(diverging):
+            return int(diverging[0])
+        if len(steps_a) != len(steps_b):
+            return n_steps
+        return None
@@ -0,0 +1,87 @@
+import numpy as np
+from typing import Dict
+from ..plant import Plant, OrderItem
+from ..maintenance import MaintenanceCalendar
+
+
+class RelaxationUpperBound:
+    """
+    Upper bound of the benefits of any planification, from a relaxation solved with NumPy.
+
+    Orders are produced at full price (no transition penalization), transitions, t_min,
+    stocks and not allowed transitions are ignored and each unit solves a fractional
+    knapsack of the orders with its available time. The bound is the minimum between
+    the sum of the unit knapsacks and the benefit of every order in its best unit.
+    """
+    def __init__(
+            self,
+            plant: "Plant",
+            horizon: int = 30 * 24,
+            maintenance: MaintenanceCalendar = None,
+    ):
+        """
+        maintenance: maintenance stops, plant.maintenance by default
+        """
+        self.plant = plant
+        self.horizon = horizon
+        self.maintenance = plant.maintenance if maintenance is None else maintenance
+
+    @staticmethod
+    def fractional_knapsack(values, weights, capacity):
+        """
+        returns the maximum value of items (fractions allowed) with total weight <= capacity
+        """
+        positive = values > 0
+        values, weights = values[positive], weights[positive]
+        order = np.argsort(-values / weights, kind='stable')
+        values, weights = values[order], weights[order]
+        cum_weights = np.cumsum(weights)
+        n_full = np.searchsorted(cum_weights, capacity, side='right')
+        value = values[:n_full].sum()
+        if n_full < len(values):
+            used = cum_weights[n_full - 1] if n_full else 0.
+            value += values[n_full] * (capacity - used) / weights[n_full]
+        return value
+
+    def calculate_unit_capacity(self, unit, times):
+        """
+        Free time of the unit in the horizon plus the longest order group that can start before it
+        """
+        free_time = self.horizon - self.maintenance.blocked_time(unit, 0, self.horizon)
+        max_time = times.max() if len(times) else 0.
+        return free_time + self.plant.t_min.max() + 2 * max_time
+
+    def calculate(self, orders: Dict[str, OrderItem] = None):
+        """
+        orders: orders to plan, plant.orders['firm'] by default
+        """
+        if orders is None:
+            orders = self.plant.orders['firm']
+        if not orders:
+            return 0.
+        grade, tons, price, _ = np.array(list(orders.values()), dtype=float).T
+        grade = grade.astype(int)
+
+        # n_orders x n_units
+        times = tons[:, None] / self.plant.prod_flow[grade]
+        benefits = price[:, None] - self.plant.man_cost[grade] * times
+        unique_orders = np.isin(grade, list(self.plant.unique_grades))
+        other_units = [unit for unit in range(self.plant.n_units) if unit != self.plant.unique_unit]
+        benefits[np.ix_(unique_orders, other_units)] = -np.inf
+
+        knapsack_bound = sum(
+            self.fractional_knapsack(
+                benefits[:, unit], times[:, unit], self.calculate_unit_capacity(unit, times[:, unit]))
+            for unit in range(self.plant.n_units)
+        )
+        orders_bound = np.maximum(benefits.max(axis=1), 0).sum()
+        return float(min(knapsack_bound, orders_bound))
+
+    @staticmethod
+    def calculate_gap(benefits, upper_bound):
+        """
+        returns the optimality gap of benefits in percentage of upper_bound
+        """
+        if upper_bound <= 0:
+            return 0.
+        return 100 * (upper_bound - benefits) / upper_bound
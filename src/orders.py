@@ -0,0 +1,92 @@
+import numpy as np
+from typing import Dict, Set, Iterable
+from .plant import OrderItem
+
+
+class OrdersState:
+    """
+    Orders of a planification shared by reference by all unit models.
+
+    ...
+    Attributes
+    ----------
+    order_ids: List[str]
+        order index -> order_id
+    order2index: Dict[str, int]
+        order_id -> order index
+    orders: List[OrderItem]
+        order index -> (grade, tons, price, priority)
+    completed: n_orders np.array (bool)
+        completion bitmap over order indices
+    remaining: n_grades np.array (int)
+        number of orders not completed per grade
+    grade2orders: Dict[int, np.array]
+        grade -> order indices sorted by decreasing price per ton
+    """
+    def __init__(
+            self,
+            orders: Dict[str, OrderItem],
+            n_grades: int,
+            orders_completed: Set[str] = None,
+    ):
+        self.order_ids = list(orders.keys())
+        self.order2index = {order_id: i for i, order_id in enumerate(self.order_ids)}
+        self.orders = [tuple(orders[order_id]) for order_id in self.order_ids]
+
+        data = np.array(self.orders, dtype=float).reshape(-1, 4)
+        self.grades = data[:, 0].astype(int)
+        self.tons = data[:, 1]
+        self.prices = data[:, 2]
+        self.price_per_ton = self.prices / self.tons
+
+        self.completed = np.zeros(len(self.order_ids), dtype=bool)
+        self.remaining = np.bincount(self.grades, minlength=n_grades)
+
+        order = np.lexsort((-self.price_per_ton, self.grades))
+        bounds = np.searchsorted(self.grades[order], np.arange(n_grades + 1))
+        self.grade2orders = {
+            grade: order[bounds[grade]:bounds[grade + 1]]
+            for grade in range(n_grades) if bounds[grade] < bounds[grade + 1]
+        }
+        # first position in grade2orders[grade] that may not be completed
+        self.grade2pos = {grade: 0 for grade in self.grade2orders}
+
+        if orders_completed:
+            self.complete([self.order2index[order_id] for order_id in orders_completed
+                           if order_id in self.order2index])
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    def complete(self, indices: Iterable[int]):
+        for index in indices:
+            if not self.completed[index]:
+                self.completed[index] = True
+                self.remaining[self.grades[index]] -= 1
+
+    def remaining_orders(self, grade, limit=None):
+        """
+        returns the indices of the orders of grade not completed, by decreasing price per ton
+        limit: maximum number of orders, all of them by default
+        """
+        if grade not in self.grade2orders or not self.remaining[grade]:
+            return []
+        grade_orders = self.grade2orders[grade][self.grade2pos[grade]:]
+        return grade_orders[~self.completed[grade_orders]][:limit].tolist()
+
+    def best_price_per_ton(self, grade):
+        """
+        returns the maximum price per ton among the orders of grade not completed,
+        None if all of them are completed.
+        """
+        if grade not in self.grade2orders or not self.remaining[grade]:
+            return None
+        grade_orders = self.grade2orders[grade]
+        pos = self.grade2pos[grade]
+        while self.completed[grade_orders[pos]]:
+            pos += 1
+        self.grade2pos[grade] = pos
+        return self.price_per_ton[grade_orders[pos]]
+
+    def completed_ids(self):
+        return {self.order_ids[index] for index in np.flatnonzero(self.completed)}
@@ -0,0 +1,196 @@
+import abc
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, List, Tuple
+
+ORDERS_PLAN_DTYPE = np.dtype([
+    ('unit', np.int16),
+    ('order', np.int32),  # index in OrdersPlan.order_ids
+    ('grade', np.int16),
+    ('start', np.float64),
+    ('end', np.float64),
+    ('benefit', np.float64),
+    ('revenue', np.float64),
+])
+
+GRADES_PLAN_DTYPE = np.dtype([
+    ('unit', np.int16),
+    ('grade', np.int16),
+    ('start', np.float64),
+])
+
+
+class StructuredPlan(Mapping, abc.ABC):
+    """
+    Plan rows of every unit in a NumPy structured array with amortized append.
+
+    Read as a dictionary unit -> list of tuples, like the plans of the solvers. The tuples of
+    every unit are built in a single pass over the rows and kept until the next append.
+    Subclasses set dtype and implement row_to_tuple.
+    """
+    dtype = None
+    initial_capacity = 64
+
+    def __init__(self, n_units: int):
+        self.n_units = n_units
+        self._data = np.empty(self.initial_capacity, dtype=self.dtype)
+        self._size = 0
+        # unit -> list of tuples, None after an append
+        self._unit_rows = None
+
+    @property
+    def array(self):
+        """
+        structured array with the rows of the plan in insertion order (a view, not a copy)
+        """
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self.n_units
+
+    def __iter__(self):
+        return iter(range(self.n_units))
+
+    def __getitem__(self, unit):
+        if not 0 <= unit < self.n_units:
+            raise KeyError(unit)
+        return list(self._split_rows()[unit])
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self.items())})'
+
+    @property
+    def n_rows(self):
+        return self._size
+
+    def _append_row(self, row):
+        if self._size == len(self._data):
+            data = np.empty(2 * len(self._data), dtype=self.dtype)
+            data[:self._size] = self._data
+            self._data = data
+        self._data[self._size] = row
+        self._size += 1
+        self._unit_rows = None
+
+    def _extend_rows(self, rows):
+        size = self._size + len(rows)
+        if size > len(self._data):
+            data = np.empty(max(size, 2 * len(self._data)), dtype=self.dtype)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size:size] = rows
+        self._size = size
+        self._unit_rows = None
+
+    def _split_rows(self):
+        if self._unit_rows is None:
+            unit_rows = {unit: [] for unit in range(self.n_units)}
+            for row in self.array.tolist():
+                unit_rows[row[0]].append(self.row_to_tuple(row))
+            self._unit_rows = unit_rows
+        return self._unit_rows
+
+    @abc.abstractmethod
+    def row_to_tuple(self, row):
+        """
+        returns the tuple of a row of the array (a tuple of Python values) in the plans of the solvers
+        """
+
+    def to_dict(self):
+        """
+        returns unit -> list of tuples, with Python types (json serializable)
+        """
+        return {unit: list(rows) for unit, rows in self._split_rows().items()}
+
+
+class OrdersPlan(StructuredPlan):
+    """
+    Orders plan: unit -> [(order_id, grade, start_time, end_time, benefit, revenue)]
+
+    Order ids are stored once in order_ids and referenced by index in the array.
+    """
+    dtype = ORDERS_PLAN_DTYPE
+
+    def __init__(self, n_units: int):
+        super().__init__(n_units)
+        self.order_ids: List[str] = []
+        self.order2index: Dict[str, int] = {}
+
+    def order_index(self, order_id):
+        index = self.order2index.get(order_id)
+        if index is None:
+            index = len(self.order_ids)
+            self.order_ids.append(order_id)
+            self.order2index[order_id] = index
+        return index
+
+    def append(self, unit, order_id, grade, start_time, end_time, benefit, revenue):
+        self._append_row((unit, self.order_index(order_id), grade, start_time, end_time, benefit, revenue))
+
+    def extend(self, other: "OrdersPlan"):
+        rows = other.array.copy()
+        remap = np.array([self.order_index(order_id) for order_id in other.order_ids], dtype=np.int32)
+        if len(rows):
+            rows['order'] = remap[rows['order']]
+        self._extend_rows(rows)
+
+    def row_to_tuple(self, row):
+        (_, order, grade, start_time, end_time, benefit, revenue) = row
+        return self.order_ids[order], grade, start_time, end_time, benefit, revenue
+
+    def planned_order_ids(self):
+        return [self.order_ids[order] for order in self.array['order'].tolist()]
+
+    def calculate_revenue(self):
+        return float(self.array['revenue'].sum())
+
+    @classmethod
+    def from_dict(cls, n_units, orders_plan: Dict[int, List[Tuple]]):
+        plan = cls(n_units)
+        for unit, order_list in orders_plan.items():
+            for order in order_list:
+                plan.append(int(unit), *order)
+        return plan
+
+
+class GradesPlan(StructuredPlan):
+    """
+    Grades plan: unit -> [(grade, start_time)]
+    """
+    dtype = GRADES_PLAN_DTYPE
+
+    def append(self, unit, grade, start_time):
+        self._append_row((unit, grade, start_time))
+
+    def extend(self, other: "GradesPlan"):
+        self._extend_rows(other.array)
+
+    def row_to_tuple(self, row):
+        (_, grade, start_time) = row
+        return grade, start_time
+
+    def sorted_array(self):
+        """
+        returns the rows sorted by unit, keeping the order of every unit
+        """
+        rows = self.array
+        return rows[np.argsort(rows['unit'], kind='stable')]
+
+    def calculate_end_times(self, rows, horizon):
+        """
+        rows: sorted_array() rows
+        returns the end time of every row: start of the next grade in the unit, horizon for the last one
+        """
+        end_times = np.full(len(rows), float(horizon))
+        if len(rows):
+            same_unit = rows['unit'][1:] == rows['unit'][:-1]
+            end_times[:-1][same_unit] = rows['start'][1:][same_unit]
+        return end_times
+
+    @classmethod
+    def from_dict(cls, n_units, grades_plan: Dict[int, List[Tuple]]):
+        plan = cls(n_units)
+        for unit, grades_list in grades_plan.items():
+            for (grade, start_time) in grades_list:
+                plan.append(int(unit), grade, start_time)
+        return plan
@@ -2,7 +2,13 @@ import numpy as np
 import json
 from typing import List, Dict, Tuple
 from .plant import Plant
+from .maintenance import MaintenanceCalendar, MaintenanceStop
+from .plan import OrdersPlan, GradesPlan
 from .optimization.greedy_simple_group import PlantGreedyGroup
+from .optimization.rolling_horizon import PlantRollingHorizon
+from .optimization.upper_bound import RelaxationUpperBound
+from .optimization.trace import GreedyTrace
+from .optimization.coarsening import OrdersCoarsening
 
 
 class Planification:
@@ -16,51 +22,175 @@ class Planification:
                               List[Tuple[str, int, int, int, float, float]]] = None,
             # (grade, start_time)
             grades_plan: Dict[int, List[Tuple[int, int]]] = None,
-            # TODO: Maintenance stops
+            # unit -> [(start_time, end_time)], plant maintenance stops by default
+            maintenance_stops: Dict[int, List[MaintenanceStop]] = None,
     ):
         self.plant: Plant = plant
         self.complete: bool = complete
         self.horizon: int = horizon
+        if maintenance_stops is None:
+            self.maintenance = plant.maintenance
+        else:
+            self.maintenance = MaintenanceCalendar(maintenance_stops, plant.n_units)
         self.stocks = np.zeros(plant.n_grades)
 
-        if orders_plan:
+        if isinstance(orders_plan, OrdersPlan):
             self.orders_plan = orders_plan
         else:
-            self.orders_plan = {i: [] for i in range(self.plant.n_units)}
+            self.orders_plan = OrdersPlan.from_dict(self.plant.n_units, orders_plan or {})
 
-        if grades_plan:
+        if isinstance(grades_plan, GradesPlan):
             self.grades_plan = grades_plan
         else:
-            self.grades_plan = {i: [] for i in range(self.plant.n_units)}
+            self.grades_plan = GradesPlan.from_dict(self.plant.n_units, grades_plan or {})
 
         self.orders_completed = set()
         self.benefits = 0
+        self.upper_bound = None
+        self.gap = None
 
     def check_feasibility(self):
-        raise NotImplementedError('Method not implemented!')
+        """
+        returns a list with the constraints violated by the plans, empty if they are feasible
+        """
+        violations = []
+        orders = self.orders_plan.array
+        if len(np.unique(orders['order'])) < len(orders):
+            violations.append('orders planned more than once')
+        if np.any(orders['end'] < orders['start']):
+            violations.append('orders with end_time < start_time')
+        orders = orders[np.argsort(orders['unit'], kind='stable')]
+        same_unit = orders['unit'][1:] == orders['unit'][:-1]
+        if np.any(same_unit & (orders['start'][1:] < orders['end'][:-1] - 1e-6)):
+            violations.append('overlapping orders in a unit')
+
+        grades = self.grades_plan.sorted_array()
+        units, grade_ids, start_times = grades['unit'], grades['grade'], grades['start']
+        unique_grades = np.isin(grade_ids, list(self.plant.unique_grades))
+        if np.any(unique_grades & (units != self.plant.unique_unit)):
+            violations.append('unique grades out of unique unit')
+        after_10_days = np.isin(grade_ids, list(self.plant.grades_after_10_days))
+        if np.any(after_10_days & (start_times < 10 * self.plant.intervals_per_day)):
+            violations.append('grades before day 10')
+
+        same_unit = units[1:] == units[:-1]
+        prev_grades, next_grades = grade_ids[:-1][same_unit], grade_ids[1:][same_unit]
+        durations = (start_times[1:] - start_times[:-1])[same_unit]
+        if np.any(durations < self.plant.t_min[prev_grades]):
+            violations.append('grades shorter than t_min')
+        if not np.all(self.plant.allowed_transitions[prev_grades, next_grades]):
+            violations.append('not allowed transitions')
+        return violations
 
     def calculate_benefits(self):
         return self.calculate_revenue() - self.calculate_cost()
 
     def calculate_revenue(self):
-        return sum([order[-1] for unit, order_list in self.orders_plan.items() for order in order_list])
+        return self.orders_plan.calculate_revenue()
 
     def calculate_cost(self):
-        cost = 0
-        for unit, grades_list in self.grades_plan.items():
-            size = len(grades_list)
-            for i, (grade, start_time) in enumerate(grades_list):
-                if i < size - 1:
-                    end_time = grades_list[i + 1][-1]
-                else:
-                    end_time = self.horizon
-                cost += self.plant.man_cost[grade, unit] * (end_time - start_time)
-        return cost
-
-    def calculate_initial_solution(self):
+        grades = self.grades_plan.sorted_array()
+        end_times = self.grades_plan.calculate_end_times(grades, self.horizon)
+        production_times = end_times - grades['start'] - self.maintenance.blocked_times(
+            grades['unit'], grades['start'], end_times)
+        return float((self.plant.man_cost[grades['grade'], grades['unit']] * production_times).sum())
+
+    def calculate_upper_bound(self):
+        model = RelaxationUpperBound(
+            plant=self.plant,
+            horizon=self.horizon,
+            maintenance=self.maintenance,
+        )
+        return model.calculate()
+
+    def calculate_gap(self):
+        """
+        Optimality gap (%) of benefits against the relaxation upper bound
+        """
+        if self.upper_bound is None:
+            self.upper_bound = self.calculate_upper_bound()
+        self.gap = RelaxationUpperBound.calculate_gap(self.benefits, self.upper_bound)
+        return self.gap
+
+    def calculate_initial_solution(self, record_trace=False, unit_states=None, top_k_orders=None,
+                                   n_sample_grades=None, grade_sampling='bound', seed=None, vectorized=False,
+                                   macro_grades=False):
+        """
+        unit_states: unit -> state (UnitGreedySimpleGroup.get_state) to replan from
+        top_k_orders, n_sample_grades, grade_sampling, seed: approximate greedy (PlantGreedyGroup),
+            see reports.approximate_greedy_report for the loss of every setting
+        vectorized: score the candidates of all the units at once, same solution as the exact greedy
+        macro_grades: evaluate the forced only_predecessor chains as single candidates
+        returns the GreedyTrace of the solution if record_trace, else None
+        """
         model = PlantGreedyGroup(
             plant=self.plant,
             horizon=self.horizon,
+            unit_states=unit_states,
+            maintenance=self.maintenance,
+            record_trace=record_trace,
+            top_k_orders=top_k_orders,
+            n_sample_grades=n_sample_grades,
+            grade_sampling=grade_sampling,
+            seed=seed,
+            vectorized=vectorized,
+            macro_grades=macro_grades,
+        )
+        orders_plan, grades_plan, orders_completed, stocks = model.find_planification()
+        self.orders_plan = orders_plan
+        self.grades_plan = grades_plan
+        self.orders_completed = orders_completed
+        self.stocks = stocks
+        self.benefits = self.calculate_benefits()
+        self.calculate_gap()
+        return model.trace
+
+    def calculate_coarsened_solution(self, n_price_bins=8, n_size_bins=2, max_bucket_tons=3000):
+        """
+        Solve with similar orders of each grade aggregated (OrdersCoarsening) and split
+        the buckets back into orders in orders_plan. returns the coarsening.
+        """
+        coarsening = OrdersCoarsening(
+            orders=self.plant.orders['firm'],
+            n_price_bins=n_price_bins,
+            n_size_bins=n_size_bins,
+            max_bucket_tons=max_bucket_tons,
+        )
+        model = PlantGreedyGroup(
+            plant=self.plant,
+            horizon=self.horizon,
+            orders=coarsening.coarse_orders,
+            maintenance=self.maintenance,
+        )
+        orders_plan, grades_plan, orders_completed, stocks = model.find_planification()
+        self.orders_plan = coarsening.split_orders_plan(orders_plan)
+        self.grades_plan = grades_plan
+        self.orders_completed = coarsening.split_orders_completed(orders_completed)
+        self.stocks = stocks
+        self.benefits = self.calculate_benefits()
+        self.calculate_gap()
+        return coarsening
+
+    def replay_trace(self, trace: GreedyTrace):
+        """
+        Rebuild the solution recorded in trace by calculate_initial_solution
+        """
+        order_ids = list(self.plant.orders['firm'].keys())
+        orders_plan, grades_plan, orders_completed, stocks = trace.replay(order_ids)
+        self.orders_plan = orders_plan
+        self.grades_plan = grades_plan
+        self.orders_completed = orders_completed
+        self.stocks = stocks
+        self.benefits = self.calculate_benefits()
+        self.calculate_gap()
+
+    def calculate_rolling_horizon_solution(self, window=10 * 24, overlap=30 * 24):
+        model = PlantRollingHorizon(
+            plant=self.plant,
+            horizon=self.horizon,
+            window=window,
+            overlap=overlap,
+            maintenance=self.maintenance,
         )
         orders_plan, grades_plan, orders_completed, stocks = model.find_planification()
         self.orders_plan = orders_plan
@@ -68,14 +198,18 @@ class Planification:
         self.orders_completed = orders_completed
         self.stocks = stocks
         self.benefits = self.calculate_benefits()
+        self.calculate_gap()
 
     def save_data(self, output_file_path):
         data = {
             'stocks': self.stocks.tolist(),
-            'orders_plan': self.orders_plan,
-            'grades_plan': self.grades_plan,
+            'orders_plan': self.orders_plan.to_dict(),
+            'grades_plan': self.grades_plan.to_dict(),
             'orders_completed': list(self.orders_completed),
-            'benefits': self.benefits
+            'maintenance_stops': self.maintenance.to_dict(),
+            'benefits': self.benefits,
+            'upper_bound': self.upper_bound,
+            'gap': self.gap,
         }
         with open(output_file_path, 'w') as outfile:
             json.dump(data, outfile, indent=2, sort_keys=True)
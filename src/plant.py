@@ -2,6 +2,7 @@ import json
 import uuid
 import numpy as np
 from typing import List, Dict, Tuple
+from .maintenance import MaintenanceCalendar, MaintenanceStop
 
 OrderItem = Tuple[int, float, float, float]  # (grade, tons, price, priority)
 
@@ -44,6 +45,21 @@ class Plant:
          List of grades that can be produced only after day 10.
      orders: Dict[str, Dict[str, List[OrderItem]]] # OrderItem :(grade, tons, price, priority)
          order_id : str -> OrderItem :(grade, tons, price, priority)
+     maintenance: MaintenanceCalendar
+         maintenance stops per unit, built from Dict[int, List[(start_time, end_time)]]
+
+     Derived structures are built on first use:
+
+     allowed_transitions: (n_grades + 1) x n_grades np.array (bool)
+         allowed_transitions[A, B]: B can be produced after A (not_allowed_transitions and
+         only_predecessor), the last row is the start without grade (actual_grade = -1)
+     grade2orders: Dict[int, Set[str]]
+         grade -> firm order_ids
+     macro_grades: List[Tuple[int, ...]]
+         chains of grades forced by only_predecessor, from a grade without predecessor
+         through every grade that can only be produced after the previous one
+     macro_grade_index: n_grades np.array (int)
+         index in macro_grades of the chain of every grade, -1 outside chains
      """
     def __init__(
             self,
@@ -63,7 +79,12 @@ class Plant:
             only_predecessor: Dict[int, int],
             grades_after_10_days: List[int],
             orders: Dict[str, Dict[str, List[OrderItem]]],
+            maintenance_stops: Dict[int, List[MaintenanceStop]] = None,
+            validate: bool = True,
     ):
+        """
+        validate: check the data (validate) and raise ValueError if it is not consistent
+        """
         self._n_grades = n_grades
         self._n_units = n_units
         self._grades = list(range(self._n_grades))
@@ -74,8 +95,10 @@ class Plant:
         self._not_allowed_transitions = not_allowed_transitions
         self._unique_grades = set(unique_grades)
         self._unique_unit = unique_unit
-        self._s_min = np.array(s_min)
-        self._t_min = np.array(t_min)
+        self._s_min = np.array(s_min, dtype=float)
+        self._t_min = np.array(t_min, dtype=float)
+        # t_min before the unique grades update
+        self._nominal_t_min = self._t_min.copy()
         self._gamma = gamma
         self._only_consecutive = only_consecutive
         self._only_predecessor = only_predecessor
@@ -85,9 +108,20 @@ class Plant:
         # Can be updated during 30 - days planification
         # TODO: Put orders out of Plant class
         self.orders = orders
+        self._maintenance_stops = maintenance_stops or {}
+        if validate:
+            self.validate()
+        self._maintenance = MaintenanceCalendar(maintenance_stops, n_units)
         # Modify t_min in unique_grades
         self.update_unique_grades_t_min()
 
+        # derived structures, built on first use
+        self._allowed_transitions = None
+        self._after_10_days_mask = None
+        self._unique_grades_mask = None
+        self._macro_grades = None
+        self._macro_grade_index = None
+
     @property
     def n_grades(self):
         return self._n_grades
@@ -156,6 +190,46 @@ class Plant:
     def grades_after_10_days(self):
         return self._grades_after_10_days
 
+    @property
+    def maintenance(self):
+        return self._maintenance
+
+    @property
+    def orders(self):
+        return self._orders
+
+    @orders.setter
+    def orders(self, orders):
+        self._orders = orders
+        self._grade2orders = None
+
+    @property
+    def grade2orders(self):
+        """
+        grade -> firm order_ids, built on first use (assign orders again after editing them in place)
+        """
+        if self._grade2orders is None:
+            self._grade2orders = self.group_orders_by_grade(self.orders.get('firm', {}))
+        return self._grade2orders
+
+    @property
+    def allowed_transitions(self):
+        if self._allowed_transitions is None:
+            self.build_transition_masks()
+        return self._allowed_transitions
+
+    @property
+    def macro_grades(self):
+        if self._macro_grades is None:
+            self.build_macro_grades()
+        return self._macro_grades
+
+    @property
+    def macro_grade_index(self):
+        if self._macro_grades is None:
+            self.build_macro_grades()
+        return self._macro_grade_index
+
     @staticmethod
     def from_json_file(file_path):
         def __dict_keys2int(data):
@@ -184,6 +258,7 @@ class Plant:
             only_predecessor=plant_data.get('only_predecessor'),
             grades_after_10_days=plant_data.get('grades_after_10_days'),
             orders=plant_data.get('orders'),
+            maintenance_stops=plant_data.get('maintenance_stops'),
         )
         return plant
 
@@ -206,17 +281,121 @@ class Plant:
             only_predecessor=plant_data.get('only_predecessor'),
             grades_after_10_days=plant_data.get('grades_after_10_days'),
             orders=plant_data.get('orders'),
+            maintenance_stops=plant_data.get('maintenance_stops'),
         )
         return plant
 
+    def validate(self):
+        """
+        Check the shapes, the grades of the constraints and orders, the positivity of tons and prices
+        and the consistency of the constraints, vectorized over every input.
+        raises ValueError with all the problems found
+        """
+        n_grades, n_units = self.n_grades, self.n_units
+        errors = []
+        if n_grades <= 0 or n_units <= 0 or self.intervals_per_day <= 0:
+            raise ValueError('n_grades, n_units and intervals_per_day must be positive')
+
+        arrays = {
+            'prod_flow': (self.prod_flow, (n_grades, n_units)),
+            'man_cost': (self.man_cost, (n_grades, n_units)),
+            't_transition': (self.t_transition, (n_grades, n_grades)),
+            's_min': (self.s_min, (n_grades,)),
+            't_min': (self.t_min, (n_grades,)),
+        }
+        for name, (values, shape) in arrays.items():
+            if values.shape != shape:
+                errors.append(f'{name} has shape {values.shape}, expected {shape}')
+            elif not np.all(np.isfinite(values) & (values >= 0)):
+                errors.append(f'{name} has negative or not finite values')
+        if not errors and not np.all(self.prod_flow > 0):
+            errors.append('prod_flow has zero values')
+        if not 0 <= self.gamma <= 1:
+            errors.append(f'gamma {self.gamma} out of [0, 1]')
+        if not 0 <= self.unique_unit < n_units:
+            errors.append(f'unique_unit {self.unique_unit} out of range')
+
+        not_allowed = self.not_allowed_transitions or {}
+        grade_fields = {
+            'unique_grades': list(self.unique_grades),
+            'grades_after_10_days': list(self.grades_after_10_days),
+            'not_allowed_transitions': list(not_allowed) + [g for grades in not_allowed.values() for g in grades],
+            'only_consecutive': list(self.only_consecutive.items()),
+            'only_predecessor': list(self.only_predecessor.items()),
+        }
+        for name, grades in grade_fields.items():
+            grades = np.array(grades, dtype=float).ravel()
+            if np.any((grades < 0) | (grades >= n_grades) | (grades != np.round(grades))):
+                errors.append(f'{name} has grades out of range')
+        units = np.array(list(self._maintenance_stops), dtype=float)
+        if np.any((units < 0) | (units >= n_units)):
+            errors.append('maintenance_stops has units out of range')
+
+        for kind, orders in (self.orders or {}).items():
+            if not orders:
+                continue
+            order_ids = list(orders)
+            try:
+                data = np.array(list(orders.values()), dtype=float)
+            except ValueError:
+                data = np.zeros(0)
+            if data.ndim != 2 or data.shape[1] != 4:
+                errors.append(f'{kind} orders must be (grade, tons, price, priority)')
+                continue
+            grades, tons, prices = data[:, 0], data[:, 1], data[:, 2]
+            bad = (grades < 0) | (grades >= n_grades) | (grades != np.round(grades))
+            if np.any(bad):
+                errors.append(f'{kind} order {order_ids[np.argmax(bad)]} has grade out of range')
+            bad = ~(np.isfinite(tons) & np.isfinite(prices) & (tons > 0) & (prices > 0))
+            if np.any(bad):
+                errors.append(f'{kind} order {order_ids[np.argmax(bad)]} has not positive tons or price')
+
+        if errors:
+            raise ValueError('Invalid plant data: ' + '; '.join(errors))
+
+        # only_predecessor: predecessor -> consecutive must be an only_consecutive allowed transition
+        consecutive = np.array(list(self.only_predecessor), dtype=int)
+        predecessors = np.array([self.only_predecessor[grade] for grade in consecutive], dtype=int)
+        only_consecutive = np.full(n_grades, -1)
+        only_consecutive[list(self.only_consecutive)] = list(self.only_consecutive.values())
+        not_allowed_mask = np.zeros((n_grades, n_grades), dtype=bool)
+        for grade, grades in not_allowed.items():
+            not_allowed_mask[grade, grades] = True
+        bad = (only_consecutive[predecessors] != consecutive) | not_allowed_mask[predecessors, consecutive]
+        if np.any(bad):
+            errors.append(f'only_predecessor {dict(zip(consecutive[bad].tolist(), predecessors[bad].tolist()))} '
+                          f'not in only_consecutive or not allowed')
+        # grades whose predecessors chain never ends (predecessor cycles) can never be produced,
+        # pointer jumping: after k jumps jump[g] is the 2^k-th predecessor of g, n_grades if there is none
+        jump = np.full(n_grades + 1, n_grades)
+        jump[consecutive] = predecessors
+        for _ in range(int(np.ceil(np.log2(n_grades + 1))) + 1):
+            jump = jump[jump]
+        cycle_grades = np.flatnonzero(jump[:n_grades] != n_grades)
+        if len(cycle_grades):
+            errors.append(f'only_predecessor has cycles, grades {cycle_grades.tolist()} can not be produced')
+        if errors:
+            raise ValueError('Invalid plant data: ' + '; '.join(errors))
+
     def update_unique_grades_t_min(self):
         """
-        Update minimum time to produce at least 1000 tons
+        Update minimum time to produce at least 1000 tons, from the nominal t_min
+        (call it again after changing prod_flow)
         TODO: Unique grades can produce 1000 tones combined
         """
-        for grade in self.unique_grades:
-            t_1000_tons = 1000 / self.prod_flow[grade, self.unique_unit]
-            self.t_min[grade] = max(self.t_min[grade], t_1000_tons)
+        grades = sorted(self.unique_grades)
+        t_1000_tons = 1000 / self.prod_flow[grades, self.unique_unit]
+        self.t_min[grades] = np.maximum(self._nominal_t_min[grades], t_1000_tons)
+
+    def build_transition_masks(self):
+        allowed_transitions = np.ones((self.n_grades + 1, self.n_grades), dtype=bool)
+        for grade, not_allowed_grades in self.not_allowed_transitions.items():
+            allowed_transitions[grade, not_allowed_grades] = False
+        for grade, predecessor in self.only_predecessor.items():
+            allowed_transitions[np.arange(self.n_grades + 1) != predecessor, grade] = False
+        self._allowed_transitions = allowed_transitions
+        self._after_10_days_mask = np.isin(self.grades, list(self.grades_after_10_days))
+        self._unique_grades_mask = np.isin(self.grades, list(self.unique_grades))
 
     def is_possible_transition(self, grade, time, unit, actual_grade):
         """
@@ -224,9 +403,7 @@ class Plant:
         """
         if time <= 10 * self.intervals_per_day and grade in self.grades_after_10_days:
             return False
-        elif grade in self.not_allowed_transitions.get(actual_grade, []):
-            return False
-        elif grade in self.only_predecessor and self.only_predecessor[grade] != actual_grade:
+        elif not self.allowed_transitions[actual_grade, grade]:
             return False
         elif unit != self.unique_unit and grade in self.unique_grades:
             return False
@@ -237,13 +414,68 @@ class Plant:
         """
         returns a list of grades that can be produced after actual_grade in unit and time.
         """
-        possible_transitions = []
-        for grade in self.grades:
-            if grade == actual_grade:
-                possible_transitions.append(grade)
-            elif self.is_possible_transition(grade, time, unit, actual_grade):
-                possible_transitions.append(grade)
-        return possible_transitions
+        possible = self.allowed_transitions[actual_grade].copy()
+        if time <= 10 * self.intervals_per_day:
+            possible &= ~self._after_10_days_mask
+        if unit != self.unique_unit:
+            possible &= ~self._unique_grades_mask
+        if actual_grade != -1:
+            possible[actual_grade] = True
+        return np.flatnonzero(possible).tolist()
+
+    def calculate_possible_transitions_masks(self, times, units, actual_grades):
+        """
+        calculate_possible_transitions of many units at once
+        returns len(units) x n_grades np.array (bool)
+        """
+        times, units, actual_grades = np.asarray(times), np.asarray(units), np.asarray(actual_grades)
+        possible = self.allowed_transitions[actual_grades]
+        possible[times <= 10 * self.intervals_per_day] &= ~self._after_10_days_mask
+        possible[units != self.unique_unit] &= ~self._unique_grades_mask
+        producing = np.flatnonzero(actual_grades != -1)
+        possible[producing, actual_grades[producing]] = True
+        return possible
+
+    def build_macro_grades(self):
+        """
+        forced chains of grades, solved by the greedy as a single candidate (macro_grades=True)
+        """
+        successors = {predecessor: grade for grade, predecessor in self.only_predecessor.items()}
+        macro_grades = []
+        for grade in sorted(set(successors) - set(self.only_predecessor)):
+            macro_grade = [grade]
+            while macro_grade[-1] in successors and successors[macro_grade[-1]] not in macro_grade:
+                macro_grade.append(successors[macro_grade[-1]])
+            macro_grades.append(tuple(macro_grade))
+        macro_grade_index = np.full(self.n_grades, -1)
+        for index, macro_grade in enumerate(macro_grades):
+            macro_grade_index[list(macro_grade)] = index
+        self._macro_grades = macro_grades
+        self._macro_grade_index = macro_grade_index
+
+    def calculate_possible_macro_grades(self, time, unit, actual_grade):
+        """
+        returns the parts of the macro grades that can be produced after actual_grade in unit and time:
+        the chains from their first grade and the grades after actual_grade in its own chain,
+        up to the first grade that is not a possible transition.
+        """
+        actual_index = self.macro_grade_index[actual_grade] if actual_grade != -1 else -1
+        possible_macro_grades = []
+        for index, macro_grade in enumerate(self.macro_grades):
+            starts = [0]
+            if index == actual_index:
+                position = macro_grade.index(actual_grade)
+                starts = [position + 1] + starts[:position]
+            for start in starts:
+                end = start
+                prev_grade = actual_grade
+                while end < len(macro_grade) and self.is_possible_transition(
+                        macro_grade[end], time, unit, prev_grade):
+                    prev_grade = macro_grade[end]
+                    end += 1
+                if end > start:
+                    possible_macro_grades.append(macro_grade[start:end])
+        return possible_macro_grades
 
     @staticmethod
     def group_orders_by_grade(orders):
@@ -270,7 +502,8 @@ class RandomPlantData:
                              man_cost_lims=(10, 60), t_transition_lims=(1, 10), n_not_allowed_max=4, t_min_lims=(1, 20),
                              s_min_lims=(5, 60), only_consecutive_p=0.25,
                              n_orders=2500, orders_tons_lims=(200, 3000), orders_price_lims=(50, 1000),
-                             grades_after_10_days_max=10, unique_unit=0):
+                             grades_after_10_days_max=10, unique_unit=0,
+                             n_maintenance_stops=0, maintenance_duration_lims=(4, 24), horizon=30 * 24):
         """
         Generate random plant data for trials
         """
@@ -345,6 +578,11 @@ class RandomPlantData:
         plant_data['unique_unit'] = unique_unit
         plant_data['unique_grades'] = unique_grades.tolist()
 
+        # maintenance stops per unit in the horizon
+        if n_maintenance_stops:
+            plant_data['maintenance_stops'] = RandomPlantData.generate_random_maintenance_stops(
+                n_units, n_maintenance_stops, maintenance_duration_lims, horizon)
+
         return plant_data
 
     @classmethod
@@ -372,6 +610,14 @@ class RandomPlantData:
                     set(range(n_grades)) - set([grade]) - set([only_predecessor.get(grade)])
                 )
                 consecutive = int(np.random.choice(possible_consecutive))
+                ancestors = set()
+                predecessor = only_predecessor.get(grade)
+                while predecessor is not None and predecessor not in ancestors:
+                    ancestors.add(predecessor)
+                    predecessor = only_predecessor.get(predecessor)
+                if consecutive in ancestors:
+                    # grade would be its own predecessor, the grades of the cycle could never be produced
+                    consecutive = int(np.random.choice(list(set(possible_consecutive) - ancestors)))
                 only_consecutive[grade] = consecutive
                 only_predecessor[consecutive] = grade
 
@@ -391,6 +637,16 @@ class RandomPlantData:
             orders[order_id] = order
         return orders
 
+    @staticmethod
+    def generate_random_maintenance_stops(n_units, n_maintenance_stops, maintenance_duration_lims, horizon):
+        maintenance_stops = {}
+        for unit in range(n_units):
+            starts = np.sort(horizon * np.random.rand(n_maintenance_stops))
+            durations = RandomPlantData.generate_rand(maintenance_duration_lims, n_maintenance_stops, 1).flatten()
+            maintenance_stops[unit] = [[float(start), float(start + duration)]
+                                       for start, duration in zip(starts, durations)]
+        return maintenance_stops
+
     @staticmethod
     def generate_random_not_allowed_transitions(n_grades, n_not_allowed_max, only_consecutive):
         not_allowed_transitions = {}
@@ -0,0 +1,89 @@
+import time
+import numpy as np
+from typing import Dict, Iterable, List
+from .plant import Plant, RandomPlantData
+from .planification import Planification
+from .optimization.greedy_simple_group import PlantGreedyGroup
+
+# approximate greedy settings of approximate_greedy_report, from the most exact to the fastest
+APPROXIMATE_SETTINGS = [
+    {'top_k_orders': 40},
+    {'top_k_orders': 20},
+    {'top_k_orders': 10},
+    {'top_k_orders': 10, 'n_sample_grades': 5},
+    {'top_k_orders': 5, 'n_sample_grades': 3},
+    {'top_k_orders': 10, 'n_sample_grades': 5, 'grade_sampling': 'random', 'seed': 0},
+]
+
+
+def coarsening_report(plant: Plant, horizon: int = 30 * 24, n_price_bins=8, n_size_bins=2, max_bucket_tons=3000):
+    """
+    Compare the greedy solution with and without orders coarsening.
+    returns a dictionary with problem sizes, benefits and solving times.
+    """
+    exact = Planification(plant=plant, horizon=horizon)
+    start = time.perf_counter()
+    exact.calculate_initial_solution()
+    exact_time = time.perf_counter() - start
+
+    coarse = Planification(plant=plant, horizon=horizon)
+    start = time.perf_counter()
+    coarsening = coarse.calculate_coarsened_solution(
+        n_price_bins=n_price_bins, n_size_bins=n_size_bins, max_bucket_tons=max_bucket_tons)
+    coarse_time = time.perf_counter() - start
+
+    benefit_loss = 100 * (exact.benefits - coarse.benefits) / exact.benefits if exact.benefits else 0.
+    return {
+        'n_orders': len(coarsening.orders),
+        'n_buckets': len(coarsening.coarse_orders),
+        'reduction': coarsening.reduction,
+        'benefits': float(exact.benefits),
+        'coarsened_benefits': float(coarse.benefits),
+        'benefit_loss': float(benefit_loss),
+        'time': exact_time,
+        'coarsened_time': coarse_time,
+    }
+
+
+def approximate_greedy_report(
+        settings: List[Dict] = None,
+        seeds: Iterable[int] = range(4),
+        horizon: int = 30 * 24,
+        **plant_options
+):
+    """
+    Calibrate the approximate greedy against the exact one on RandomPlantData instances.
+    settings: list of PlantGreedyGroup approximate options
+        ({'top_k_orders', 'n_sample_grades', 'grade_sampling', 'seed'}), APPROXIMATE_SETTINGS by default
+    plant_options: RandomPlantData.generate_random_data options
+    returns a dictionary for every setting with the mean and max benefit loss (%)
+    and the mean speedup over the instances.
+    """
+    settings = APPROXIMATE_SETTINGS if settings is None else settings
+    plants = [Plant.from_dictionary(RandomPlantData.generate_random_data(seed=seed, **plant_options))
+              for seed in seeds]
+
+    def solve(plant, options):
+        model = PlantGreedyGroup(plant=plant, horizon=horizon, **options)
+        start = time.perf_counter()
+        orders_plan, grades_plan, _, _ = model.find_planification()
+        solve_time = time.perf_counter() - start
+        planification = Planification(
+            plant=plant, horizon=horizon, orders_plan=orders_plan, grades_plan=grades_plan)
+        return planification.calculate_benefits(), solve_time
+
+    exact = [solve(plant, {}) for plant in plants]
+    report = []
+    for options in settings:
+        losses, speedups = [], []
+        for plant, (benefits, solve_time) in zip(plants, exact):
+            approximate_benefits, approximate_time = solve(plant, options)
+            losses.append(100 * (benefits - approximate_benefits) / benefits if benefits else 0.)
+            speedups.append(solve_time / approximate_time)
+        report.append(dict(
+            options,
+            benefit_loss_mean=float(np.mean(losses)),
+            benefit_loss_max=float(np.max(losses)),
+            speedup_mean=float(np.mean(speedups)),
+        ))
+    return report
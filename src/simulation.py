@@ -0,0 +1,212 @@
+import copy
+import time
+import tracemalloc
+import numpy as np
+from typing import List, Tuple
+from .plant import Plant
+from .planification import Planification
+
+# (time, kind, data):
+#   ('arrival', (order_id, order)), ('cancellation', order_id), ('prod_flow', (unit, factor))
+Event = Tuple[float, str, tuple]
+
+
+class OperationsSimulator:
+    """
+    Discrete-event simulation of the plant operations over the horizon.
+
+    Firm orders arrive and are cancelled, and the production flow of the units changes
+    (factor of the nominal prod_flow). Every replan_every hours the rest of the horizon is
+    replanned with Planification from the executed state of the units, and the orders planned
+    to start before the next replanning are executed with the actual production flow.
+    Events are applied at the replanning before them (arrivals) or to the execution of
+    the whole period (cancellations and flow changes).
+
+    Every replanning starts from the state of the units (UnitGreedySimpleGroup.get_state)
+    adjusted by the executed orders: actual grade, regularization and minimum grade time left,
+    and the minimum stocks produced at every grade change. Realized benefits only charge
+    the production time of the orders.
+    """
+    def __init__(
+            self,
+            plant: Plant,
+            events: List[Event],
+            horizon: int = 30 * 24,
+            replan_every: float = 24,
+            track_memory: bool = False,
+    ):
+        """
+        plant: plant at the beginning of the horizon, it is not modified
+        replan_every: hours between replannings
+        track_memory: measure the peak memory of every replanning (slower)
+        """
+        self.plant = copy.deepcopy(plant)
+        self.nominal_prod_flow = plant.prod_flow.copy()
+        self.events = sorted(events, key=lambda z: z[0])
+        self.horizon = horizon
+        self.replan_every = replan_every
+        self.track_memory = track_memory
+
+        self.flow_factors = np.ones(plant.n_units)
+        # unit -> state to replan from, like UnitGreedySimpleGroup.get_state
+        self.unit_states = {
+            unit: {
+                'time': 0,
+                'actual_grade': -1,
+                'time_last_grade_start': 0,
+                'time_left_grade_change': 0,
+                'time_reg_left': 0,
+                'is_initial': True,
+                'stocks': np.zeros(plant.n_grades),
+            }
+            for unit in range(plant.n_units)
+        }
+        self.cancelled = set()
+        # (order_id, unit, grade, start_time, end_time, revenue, cost)
+        self.executed = []
+        self.latencies = []
+        self.peak_memory = []
+
+    @staticmethod
+    def generate_random_events(plant_data, horizon=30 * 24, seed=None, arrival_p=0.5, cancellation_p=0.05,
+                               n_flow_changes=6, flow_factor_lims=(0.6, 1.0)):
+        """
+        Random events for a RandomPlantData dictionary: estimated orders become firm with
+        probability arrival_p, firm orders are cancelled with probability cancellation_p and
+        units change their production flow n_flow_changes times.
+        """
+        if seed is not None:
+            np.random.seed(seed)
+        events = []
+        for order_id, order in plant_data['orders']['estimated'].items():
+            if np.random.rand() < arrival_p:
+                events.append((horizon * np.random.rand(), 'arrival', (order_id, tuple(order))))
+        for order_id in plant_data['orders']['firm']:
+            if np.random.rand() < cancellation_p:
+                events.append((horizon * np.random.rand(), 'cancellation', order_id))
+        for _ in range(n_flow_changes):
+            unit = int(np.random.randint(plant_data['n_units']))
+            factor = flow_factor_lims[0] + (flow_factor_lims[1] - flow_factor_lims[0]) * np.random.rand()
+            events.append((horizon * np.random.rand(), 'prod_flow', (unit, factor)))
+        return events
+
+    def apply_event(self, event):
+        _, kind, data = event
+        firm_orders = self.plant.orders['firm']
+        if kind == 'arrival':
+            order_id, order = data
+            firm_orders[order_id] = order
+        elif kind == 'cancellation':
+            # orders already executed can not be cancelled
+            if data in firm_orders:
+                del firm_orders[data]
+                self.cancelled.add(data)
+        elif kind == 'prod_flow':
+            unit, factor = data
+            self.flow_factors[unit] = factor
+            self.plant.prod_flow[:, unit] = self.nominal_prod_flow[:, unit] * factor
+            self.plant.update_unique_grades_t_min()
+        else:
+            raise ValueError(f'Unknown event {kind}')
+
+    def replan(self, start_time):
+        unit_states = {
+            unit: dict(state, time=max(start_time, state['time']))
+            for unit, state in self.unit_states.items()
+        }
+        planification = Planification(plant=self.plant, horizon=self.horizon)
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        planification.calculate_initial_solution(unit_states=unit_states)
+        self.latencies.append(time.perf_counter() - start)
+        if self.track_memory:
+            self.peak_memory.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return planification
+
+    def update_unit_state(self, unit, grade, start_time, duration):
+        """
+        update the state of unit with an order of grade executed from start_time,
+        like UnitGreedySimpleGroup.update_with_solution
+        """
+        state = self.unit_states[unit]
+        actual_grade = state['actual_grade']
+        if grade != actual_grade:
+            if actual_grade != -1:
+                # minimum stock of the previous grade, produced until the grade change
+                tons = self.plant.prod_flow[actual_grade, unit] * max(0, start_time - state['time'])
+                tons_left = max(0, self.plant.s_min[actual_grade] - state['stocks'][actual_grade])
+                state['stocks'][actual_grade] += min(tons, tons_left)
+            state['time_reg_left'] = self.plant.t_transition[actual_grade, grade]
+            state['time_left_grade_change'] = self.plant.t_min[grade]
+            state['time_last_grade_start'] = start_time
+            state['actual_grade'] = grade
+            state['is_initial'] = False
+        state['time_reg_left'] = max(0, state['time_reg_left'] - duration)
+        state['time_left_grade_change'] = max(0, state['time_left_grade_change'] - duration)
+        state['time'] = start_time + duration
+
+    def execute(self, planification, end_time, flow_factors):
+        """
+        Execute the orders planned to start before end_time with the actual production flow.
+        flow_factors: production flow factors of the units when the plan was made
+        """
+        firm_orders = self.plant.orders['firm']
+        for unit, order_list in planification.orders_plan.items():
+            scale = flow_factors[unit] / self.flow_factors[unit]
+            for (order_id, grade, plan_start_time, plan_end_time, benefit, revenue) in order_list:
+                start_time = max(plan_start_time, self.unit_states[unit]['time'])
+                if start_time >= end_time:
+                    break
+                if order_id not in firm_orders:
+                    continue
+                duration = (plan_end_time - plan_start_time) * scale
+                cost = self.plant.man_cost[grade, unit] * duration
+                self.executed.append(
+                    (order_id, unit, grade, start_time, start_time + duration, revenue, cost))
+                self.update_unit_state(unit, grade, start_time, duration)
+                del firm_orders[order_id]
+
+    def run(self):
+        """
+        returns a report with replanning latencies (seconds), memory (bytes) and realized benefits
+        """
+        event_pos = 0
+        replan_time = 0.
+        while replan_time < self.horizon:
+            while event_pos < len(self.events) and self.events[event_pos][0] <= replan_time:
+                self.apply_event(self.events[event_pos])
+                event_pos += 1
+            planification = self.replan(replan_time)
+            flow_factors = self.flow_factors.copy()
+
+            # arrivals wait for the next replanning, cancellations and flow changes
+            # act on the execution until it
+            next_replan_time = min(replan_time + self.replan_every, self.horizon)
+            while event_pos < len(self.events) and self.events[event_pos][0] < next_replan_time:
+                self.apply_event(self.events[event_pos])
+                event_pos += 1
+            self.execute(planification, next_replan_time, flow_factors)
+            replan_time = next_replan_time
+
+        return self.report()
+
+    def report(self):
+        latencies = np.array(self.latencies)
+        revenue = sum(order[5] for order in self.executed)
+        cost = sum(order[6] for order in self.executed)
+        report = {
+            'n_replans': len(latencies),
+            'latency_p50': float(np.percentile(latencies, 50)),
+            'latency_p90': float(np.percentile(latencies, 90)),
+            'latency_p99': float(np.percentile(latencies, 99)),
+            'latency_max': float(latencies.max()),
+            'n_executed_orders': len(self.executed),
+            'n_cancelled_orders': len(self.cancelled),
+            'realized_revenue': float(revenue),
+            'realized_benefits': float(revenue - cost),
+        }
+        if self.peak_memory:
+            report['peak_memory'] = int(max(self.peak_memory))
+        return report
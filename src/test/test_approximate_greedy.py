@@ -0,0 +1,38 @@
+import pytest
+from ..plant import Plant, RandomPlantData
+from ..planification import Planification
+from ..orders import OrdersState
+from ..reports import approximate_greedy_report
+
+
+def test_remaining_orders_limit():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=300)
+    orders_state = OrdersState(plant_data['orders']['firm'], plant_data['n_grades'])
+    grade_orders = orders_state.remaining_orders(0)
+    orders_state.complete(grade_orders[:2])
+    assert orders_state.remaining_orders(0, 3) == grade_orders[2:5]
+    assert orders_state.remaining_orders(0) == grade_orders[2:]
+
+
+def test_approximate_solution():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=1000)
+    plant = Plant.from_dictionary(plant_data)
+    for grade_sampling in ['bound', 'random']:
+        planification = Planification(plant=plant, horizon=30 * 24)
+        planification.calculate_initial_solution(
+            top_k_orders=5, n_sample_grades=3, grade_sampling=grade_sampling, seed=0)
+        assert planification.benefits > 0
+        assert planification.check_feasibility() == []
+
+    with pytest.raises(ValueError):
+        Planification(plant=plant).calculate_initial_solution(n_sample_grades=3, grade_sampling='best')
+
+
+def test_approximate_greedy_report():
+    settings = [{'top_k_orders': 10**6}, {'top_k_orders': 5, 'n_sample_grades': 3}]
+    report = approximate_greedy_report(settings, seeds=[0], n_orders=500)
+    assert len(report) == 2
+    # all the orders of every grade => exact greedy
+    assert report[0]['benefit_loss_max'] == pytest.approx(0)
+    assert report[1]['n_sample_grades'] == 3
+    assert report[1]['speedup_mean'] > 0
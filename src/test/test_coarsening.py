@@ -0,0 +1,46 @@
+import pytest
+from ..plant import Plant, RandomPlantData
+from ..planification import Planification
+from ..optimization.coarsening import OrdersCoarsening
+from ..reports import coarsening_report
+
+
+def test_coarsening_buckets():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=1000, orders_tons_lims=(20, 600))
+    orders = plant_data['orders']['firm']
+    coarsening = OrdersCoarsening(orders, max_bucket_tons=2000)
+    assert len(coarsening.coarse_orders) < len(orders)
+    bucket_orders = [order_id for order_list in coarsening.bucket2orders.values() for order_id in order_list]
+    assert sorted(bucket_orders) == sorted(orders)
+    for bucket_id, order_list in coarsening.bucket2orders.items():
+        grade, tons, price, _ = coarsening.coarse_orders[bucket_id]
+        assert {orders[order_id][0] for order_id in order_list} == {grade}
+        assert tons == pytest.approx(sum(orders[order_id][1] for order_id in order_list))
+        assert price == pytest.approx(sum(orders[order_id][2] for order_id in order_list))
+        assert len(order_list) == 1 or tons <= 2000
+
+    assert len(OrdersCoarsening(orders, max_bucket_tons=0).coarse_orders) == len(orders)
+
+    # order ids that look like bucket ids are kept apart from the buckets
+    orders = {f'bucket-{i}': order for i, order in enumerate(orders.values())}
+    coarsening = OrdersCoarsening(orders, max_bucket_tons=2000)
+    bucket_orders = [order_id for order_list in coarsening.bucket2orders.values() for order_id in order_list]
+    assert sorted(bucket_orders) == sorted(orders)
+
+
+def test_coarsened_solution():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=1000, orders_tons_lims=(20, 600))
+    plant = Plant.from_dictionary(plant_data)
+    planification = Planification(
+        plant=plant,
+        horizon=30 * 24
+    )
+    coarsening = planification.calculate_coarsened_solution()
+    order_ids = [order[0] for order_list in planification.orders_plan.values() for order in order_list]
+    assert set(order_ids) == planification.orders_completed
+    assert set(order_ids) <= set(plant.orders['firm'])
+    assert planification.benefits >= 0
+
+    report = coarsening_report(plant, horizon=30 * 24)
+    assert report['n_buckets'] == len(coarsening.coarse_orders)
+    assert report['coarsened_benefits'] == pytest.approx(planification.benefits)
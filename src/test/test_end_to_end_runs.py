@@ -60,3 +60,46 @@ def test_end_to_end_runs():
         _check_minimum_production_times(plant, planification)
         _check_10_days_orders(plant, planification)
         _check_possible_transitions(plant, planification)
+        assert planification.check_feasibility() == []
+
+
+def test_rolling_horizon_runs():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=5000)
+    plant = Plant.from_dictionary(plant_data)
+    planification = Planification(
+        plant=plant,
+        horizon=60 * 24
+    )
+    planification.calculate_rolling_horizon_solution(window=10 * 24, overlap=20 * 24)
+    assert set(list(planification.grades_plan.keys())) == set(range(plant.n_units))
+    assert planification.benefits >= 0
+    order_ids = [order[0] for order_list in planification.orders_plan.values() for order in order_list]
+    assert len(order_ids) == len(set(order_ids)) == len(planification.orders_completed)
+    for unit, order_list in planification.orders_plan.items():
+        end_times = [order[3] for order in order_list]
+        assert end_times == sorted(end_times)
+    _check_unique_units(plant, planification)
+    _check_minimum_production_times(plant, planification)
+    _check_10_days_orders(plant, planification)
+    _check_possible_transitions(plant, planification)
+    assert planification.check_feasibility() == []
+
+
+def test_rolling_horizon_unique_grades_dominate_ranking():
+    plant_data = RandomPlantData.generate_random_data(seed=1, n_orders=3000)
+    orders = plant_data['orders']['firm']
+    for order_id, (grade, tons, price, priority) in orders.items():
+        if grade in plant_data['unique_grades']:
+            orders[order_id] = (grade, tons, 5 * price, priority)
+    plant = Plant.from_dictionary(plant_data)
+    busy_times = []
+    for rolling_horizon in [False, True]:
+        planification = Planification(plant=plant, horizon=30 * 24)
+        if rolling_horizon:
+            planification.calculate_rolling_horizon_solution(window=10 * 24, overlap=30 * 24)
+        else:
+            planification.calculate_initial_solution()
+        busy_times.append({unit: sum(order[3] - order[2] for order in order_list)
+                           for unit, order_list in planification.orders_plan.items()})
+    for unit in range(plant.n_units):
+        assert busy_times[1][unit] >= 0.95 * busy_times[0][unit]
@@ -0,0 +1,88 @@
+from ..plant import Plant, RandomPlantData
+from ..maintenance import MaintenanceCalendar
+from ..optimization.greedy_simple_group import UnitGreedySimpleGroup
+from ..planification import Planification
+
+
+def _exhaustive_best_ratio(model, possible_transitions):
+    ratios = []
+    for grade in possible_transitions:
+        grade_orders = model.orders_state.remaining_orders(grade)
+        best_order_data = model.calculate_best_grade_order_group(
+            grade_orders, model.plant.t_transition[model.actual_grade, grade],
+            model.calculate_min_transition_time(grade))
+        if best_order_data is not None:
+            ratios.append(best_order_data[0][0])
+    return max(ratios)
+
+
+def test_grade_ratio_bound_pruning():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=300)
+    plant = Plant.from_dictionary(plant_data)
+    for unit in range(plant.n_units):
+        model = UnitGreedySimpleGroup(plant=plant, unit=unit)
+        possible_transitions = plant.calculate_possible_transitions(0, unit, -1)
+        best_solution = model.calculate_best_grade_solution(-1, possible_transitions)
+        assert best_solution['ratio'] == _exhaustive_best_ratio(model, possible_transitions)
+        for grade in possible_transitions:
+            bound = model.calculate_grade_ratio_bound(grade)
+            if bound is not None:
+                assert bound >= _exhaustive_best_ratio(model, [grade])
+
+
+def _chain_plant(**options):
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=300, **options)
+    plant_data['only_consecutive'] = {0: 1, 1: 2, 2: 3, 4: 5}
+    plant_data['only_predecessor'] = {1: 0, 2: 1, 3: 2, 5: 4}
+    plant_data['not_allowed_transitions'] = {grade: [] for grade in range(plant_data['n_grades'])}
+    plant_data['unique_grades'] = []
+    plant_data['grades_after_10_days'] = []
+    return Plant.from_dictionary(plant_data)
+
+
+def test_macro_grades():
+    plant = _chain_plant()
+    assert plant.macro_grades == [(0, 1, 2, 3), (4, 5)]
+    assert plant.macro_grade_index.tolist()[:7] == [0, 0, 0, 0, 1, 1, -1]
+    assert plant.calculate_possible_macro_grades(0, 0, -1) == [(0, 1, 2, 3), (4, 5)]
+    assert plant.calculate_possible_macro_grades(0, 0, 1) == [(2, 3), (0, 1, 2, 3), (4, 5)]
+    assert plant.calculate_possible_macro_grades(0, 0, 3) == [(0, 1, 2, 3), (4, 5)]
+
+    model = UnitGreedySimpleGroup(plant=plant, unit=0, macro_grades=True)
+    model.actual_grade = 1
+    possible_transitions, possible_macro_grades = model.calculate_candidates(0)
+    assert possible_transitions == [1] + list(range(6, plant.n_grades))
+    assert possible_macro_grades == [(2, 3), (0, 1, 2, 3), (4, 5)]
+
+
+def test_split_macro_grade_solution():
+    plant = _chain_plant(n_units=1)
+    plant.s_min[:] = 0
+    first = {'orders_group': [], 'ratio': -1., 'order_time': 10., 'grade': 0, 'benefit': -10., 'revenue': 0.,
+             'chained': True}
+    second = {'orders_group': [], 'ratio': 5., 'order_time': 10., 'grade': 1, 'benefit': 50., 'revenue': 60.,
+              'chained': True}
+    solution = {'orders_group': [], 'ratio': 2., 'order_time': 20., 'grade': 0, 'benefit': 40., 'revenue': 60.,
+                'chain': [first, second], 'start_time': 0}
+    model = UnitGreedySimpleGroup(plant=plant, unit=0, macro_grades=True)
+    assert [s['grade'] for s in model.split_solution(solution)] == [0, 1]
+    # the second grade does not fit before the stop, the first one alone is not profitable
+    model = UnitGreedySimpleGroup(plant=plant, unit=0, macro_grades=True,
+                                  maintenance=MaintenanceCalendar({0: [(15, 30)]}, 1))
+    solutions = model.split_solution(solution)
+    assert len(solutions) == 1 and 'chained' not in solutions[0]
+    assert not model.update_with_solution(solutions[0]) and model.complete
+    assert len(model.grades_plan[0]) == 0
+
+
+def test_macro_grades_planification():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=1000, only_consecutive_p=0.6)
+    plant = Plant.from_dictionary(plant_data)
+    planification = Planification(plant=plant, horizon=30 * 24)
+    planification.calculate_initial_solution()
+    benefits = planification.benefits
+    planification.calculate_initial_solution(macro_grades=True)
+    assert planification.check_feasibility() == []
+    assert planification.benefits > benefits
+    planned_grades = set(planification.grades_plan.array['grade'].tolist())
+    assert planned_grades & set(plant.only_predecessor)
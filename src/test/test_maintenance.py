@@ -0,0 +1,38 @@
+import math
+import numpy as np
+from ..maintenance import MaintenanceCalendar
+from ..plant import Plant, RandomPlantData
+from ..planification import Planification
+
+
+def test_maintenance_calendar():
+    calendar = MaintenanceCalendar({0: [(30, 40), (10, 20), (15, 25)]}, n_units=2)
+    assert calendar.stops(0) == [(10, 25), (30, 40)]
+    assert calendar.free_gap(0, 0) == (0, 10)
+    assert calendar.free_gap(0, 12) == (25, 30)
+    assert calendar.free_gap(0, 30) == (40, math.inf)
+    assert calendar.free_gap(1, 12) == (12, math.inf)
+    assert calendar.blocked_time(0, 0, 100) == 25
+    assert calendar.blocked_time(0, 20, 35) == 10
+    assert calendar.blocked_time(0, 26, 29) == 0
+    assert calendar.blocked_time(1, 0, 100) == 0
+    rows = [(0, 0, 100), (0, 20, 35), (0, 26, 29), (0, 12, 14), (0, 35, 38), (1, 0, 100)]
+    units, start_times, end_times = (np.array(column, dtype=float) for column in zip(*rows))
+    assert calendar.blocked_times(units.astype(int), start_times, end_times).tolist() == \
+        [calendar.blocked_time(*row) for row in rows]
+
+
+def test_orders_out_of_maintenance_stops():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=1000, n_maintenance_stops=20)
+    plant = Plant.from_dictionary(plant_data)
+    planification = Planification(
+        plant=plant,
+        horizon=30 * 24
+    )
+    planification.calculate_initial_solution()
+    assert planification.benefits >= 0
+    for unit, order_list in planification.orders_plan.items():
+        for (order_id, grade, start_time, end_time, benefit, revenue) in order_list:
+            gap_start, gap_end = plant.maintenance.free_gap(unit, start_time)
+            assert gap_start == start_time
+            assert end_time <= gap_end + 1e-6
@@ -0,0 +1,59 @@
+import json
+import pytest
+from ..plan import StructuredPlan, OrdersPlan, GradesPlan
+from ..plant import Plant, RandomPlantData
+from ..planification import Planification
+
+
+def test_orders_plan():
+    plan = OrdersPlan(n_units=2)
+    for i in range(200):
+        plan.append(i % 2, f'order-{i}', i % 5, float(i), i + 0.5, 10. * i, 20. * i)
+    assert plan.n_rows == 200
+    assert plan[1][0] == ('order-1', 1, 1., 1.5, 10., 20.)
+    assert len(plan[0]) == len(plan[1]) == 100
+    plan[0].pop()
+    assert len(plan[0]) == 100
+    assert plan.calculate_revenue() == sum(20. * i for i in range(200))
+    assert OrdersPlan.from_dict(2, plan.to_dict()) == plan
+
+    other = OrdersPlan(n_units=2)
+    other.append(0, 'order-new', 3, 300., 301., 1., 2.)
+    other.append(1, 'order-1', 1, 301., 302., 1., 2.)
+    plan.extend(other)
+    assert plan[0][-1] == ('order-new', 3, 300., 301., 1., 2.)
+    assert plan[1][-1] == ('order-1', 1, 301., 302., 1., 2.)
+    assert len(plan.order_ids) == 201
+
+
+def test_grades_plan():
+    plan = GradesPlan.from_dict(2, {0: [(1, 0.), (2, 10.)], 1: [(3, 5.)]})
+    assert dict(plan.items()) == {0: [(1, 0.), (2, 10.)], 1: [(3, 5.)]}
+    rows = plan.sorted_array()
+    assert plan.calculate_end_times(rows, 100).tolist() == [10., 100., 100.]
+    plan.append(1, 4, 20.)
+    assert plan[1] == [(3, 5.), (4, 20.)]
+    with pytest.raises(TypeError):
+        StructuredPlan(2)
+
+
+def test_planification_plans():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=500)
+    plant = Plant.from_dictionary(plant_data)
+    planification = Planification(plant=plant, horizon=30 * 24)
+    planification.calculate_initial_solution()
+    data = json.loads(json.dumps(planification.orders_plan.to_dict()))
+    copied = Planification(
+        plant=plant,
+        horizon=30 * 24,
+        orders_plan={int(unit): [tuple(order) for order in order_list] for unit, order_list in data.items()},
+        grades_plan=planification.grades_plan.to_dict(),
+    )
+    assert copied.orders_plan == planification.orders_plan
+    assert copied.calculate_benefits() == pytest.approx(planification.calculate_benefits())
+
+    unit = plant.unique_unit
+    other_unit = (unit + 1) % plant.n_units
+    grade = next(iter(plant.unique_grades))
+    copied.grades_plan.append(other_unit, grade, 30 * 24)
+    assert 'unique grades out of unique unit' in copied.check_feasibility()
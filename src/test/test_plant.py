@@ -0,0 +1,63 @@
+import copy
+import numpy as np
+import pytest
+from ..plant import Plant, RandomPlantData
+
+
+def _possible_transitions(plant, time, unit, actual_grade):
+    possible_transitions = []
+    for grade in plant.grades:
+        if grade == actual_grade:
+            possible_transitions.append(grade)
+        elif time <= 10 * plant.intervals_per_day and grade in plant.grades_after_10_days:
+            continue
+        elif grade in plant.not_allowed_transitions.get(actual_grade, []):
+            continue
+        elif grade in plant.only_predecessor and plant.only_predecessor[grade] != actual_grade:
+            continue
+        elif unit != plant.unique_unit and grade in plant.unique_grades:
+            continue
+        else:
+            possible_transitions.append(grade)
+    return possible_transitions
+
+
+def test_lazy_derived_structures():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=300, only_consecutive_p=0.6)
+    plant = Plant.from_dictionary(plant_data)
+    assert plant._allowed_transitions is None and plant._macro_grades is None and plant._grade2orders is None
+    for unit in range(plant.n_units):
+        for actual_grade in [-1] + plant.grades:
+            for time in [0, 11 * plant.intervals_per_day]:
+                assert plant.calculate_possible_transitions(time, unit, actual_grade) == \
+                    _possible_transitions(plant, time, unit, actual_grade)
+    states = [(time, unit, actual_grade) for unit in range(plant.n_units) for actual_grade in [-1] + plant.grades
+              for time in [0, 11 * plant.intervals_per_day]]
+    masks = plant.calculate_possible_transitions_masks(*zip(*states))
+    for mask, state in zip(masks, states):
+        assert np.flatnonzero(mask).tolist() == plant.calculate_possible_transitions(*state)
+    assert sum(len(order_ids) for order_ids in plant.grade2orders.values()) == 300
+    plant.orders = {'firm': {}}
+    assert plant.grade2orders == {}
+
+
+def test_invalid_plant_data():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=300)
+    order_id = next(iter(plant_data['orders']['firm']))
+    changes = [
+        ('prod_flow', lambda data: data['prod_flow'].pop()),
+        ('t_transition', lambda data: data['t_transition'][0].__setitem__(1, -1.)),
+        ('gamma', lambda data: data.__setitem__('gamma', 1.5)),
+        ('unique_grades', lambda data: data['unique_grades'].append(data['n_grades'])),
+        ('grade out of range', lambda data: data['orders']['firm'].__setitem__(order_id, (20, 100., 10., 0.5))),
+        ('tons or price', lambda data: data['orders']['firm'].__setitem__(order_id, (0, -100., 10., 0.5))),
+        ('cycles', lambda data: data.update(only_consecutive={0: 1, 1: 2, 2: 0},
+                                            only_predecessor={1: 0, 2: 1, 0: 2},
+                                            not_allowed_transitions={})),
+        ('only_predecessor', lambda data: data.update(only_consecutive={}, only_predecessor={1: 0})),
+    ]
+    for message, change in changes:
+        invalid_data = copy.deepcopy(plant_data)
+        change(invalid_data)
+        with pytest.raises(ValueError, match=message):
+            Plant.from_dictionary(invalid_data)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from ..plant import Plant, RandomPlantData
+from ..orders import OrdersState
+from ..optimization.greedy_simple_group import UnitGreedySimpleGroup, PlantGreedyGroup
+from ..optimization.scoring import CandidateScoring
+from ..optimization.trace import GreedyTrace
+
+
+def test_candidate_scoring_ratios():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=500)
+    plant = Plant.from_dictionary(plant_data)
+    orders_state = OrdersState(plant.orders['firm'], plant.n_grades)
+    orders_state.complete(range(0, len(orders_state), 3))
+    scoring = CandidateScoring(plant, orders_state)
+    models = [UnitGreedySimpleGroup(plant=plant, unit=unit, orders_state=orders_state)
+              for unit in range(plant.n_units)]
+    models[1].actual_grade, models[1].time_reg_left, models[1].time_left_grade_change = 3, 2., 5.
+    mask = np.ones((plant.n_units, plant.n_grades), dtype=bool)
+    time_max = np.array([np.inf, 30., 8.])
+
+    ratios = scoring.calculate_ratios(
+        range(plant.n_units),
+        np.array([model.actual_grade for model in models]),
+        np.array([model.time_reg_left for model in models], dtype=float),
+        np.array([model.time_left_grade_change for model in models], dtype=float),
+        time_max, mask
+    )
+    for unit, model in enumerate(models):
+        for grade in range(plant.n_grades):
+            solution = model.calculate_best_single_grade_solution(model.actual_grade, grade, time_max[unit])
+            if solution is None:
+                assert ratios[unit, grade] == -np.inf
+            else:
+                assert ratios[unit, grade] == solution['ratio']
+                group_data, orders_group = scoring.calculate_order_group(unit, grade)
+                assert group_data == (solution['ratio'], solution['order_time'],
+                                      solution['benefit'], solution['revenue'])
+                assert orders_group == solution['orders_group']
+
+
+def test_vectorized_planification():
+    plant_data = RandomPlantData.generate_random_data(seed=1, n_orders=1000, n_maintenance_stops=2)
+    plant = Plant.from_dictionary(plant_data)
+    traces, plans = [], []
+    for vectorized in [False, True]:
+        model = PlantGreedyGroup(plant=plant, horizon=30 * 24, record_trace=True, vectorized=vectorized)
+        orders_plan, grades_plan, _, _ = model.find_planification()
+        traces.append(model.trace)
+        plans.append((orders_plan.to_dict(), grades_plan.to_dict()))
+    assert GreedyTrace.first_divergence(*traces) is None
+    assert plans[0] == plans[1]
+
+    with pytest.raises(ValueError):
+        PlantGreedyGroup(plant=plant, top_k_orders=10, vectorized=True)
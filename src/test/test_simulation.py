@@ -0,0 +1,41 @@
+import numpy as np
+from ..plant import Plant, RandomPlantData
+from ..simulation import OperationsSimulator
+
+
+def test_operations_simulator():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=400)
+    plant = Plant.from_dictionary(plant_data)
+    events = OperationsSimulator.generate_random_events(plant_data, seed=0)
+    firm_orders = dict(plant.orders['firm'])
+    simulator = OperationsSimulator(plant, events, replan_every=5 * 24, track_memory=True)
+    report = simulator.run()
+
+    assert plant.orders['firm'] == firm_orders
+    assert report['n_replans'] == 6
+    assert 0 < report['latency_p50'] <= report['latency_p90'] <= report['latency_max']
+    assert report['peak_memory'] > 0
+    assert report['realized_benefits'] > 0
+    executed_ids = [order[0] for order in simulator.executed]
+    assert len(executed_ids) == len(set(executed_ids)) == report['n_executed_orders']
+    assert not simulator.cancelled & set(executed_ids)
+    for unit in range(plant.n_units):
+        unit_orders = [order for order in simulator.executed if order[1] == unit]
+        for prev_order, order in zip(unit_orders[:-1], unit_orders[1:]):
+            assert prev_order[4] <= order[3] + 1e-9
+        state = simulator.unit_states[unit]
+        if unit_orders:
+            assert (state['actual_grade'], state['time']) == (unit_orders[-1][2], unit_orders[-1][4])
+        assert np.all((0 <= state['stocks']) & (state['stocks'] <= plant.s_min + 1e-9))
+
+
+def test_prod_flow_event_updates_unique_grades_t_min():
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=100)
+    plant = Plant.from_dictionary(plant_data)
+    simulator = OperationsSimulator(plant, [])
+    unique_grades = sorted(plant.unique_grades)
+    simulator.apply_event((0, 'prod_flow', (plant.unique_unit, 0.1)))
+    t_1000_tons = 1000 / (0.1 * plant.prod_flow[unique_grades, plant.unique_unit])
+    assert np.allclose(simulator.plant.t_min[unique_grades], np.maximum(plant.t_min[unique_grades], t_1000_tons))
+    simulator.apply_event((0, 'prod_flow', (plant.unique_unit, 1.)))
+    assert np.allclose(simulator.plant.t_min, plant.t_min)
@@ -0,0 +1,40 @@
+from ..plant import Plant, RandomPlantData
+from ..planification import Planification
+from ..optimization.trace import GreedyTrace
+
+
+def test_trace_replay_and_diff(tmp_path):
+    plant_data = RandomPlantData.generate_random_data(seed=0, n_orders=500, n_maintenance_stops=3)
+    plant = Plant.from_dictionary(plant_data)
+    planification = Planification(
+        plant=plant,
+        horizon=30 * 24
+    )
+    trace = planification.calculate_initial_solution(record_trace=True)
+    trace_path = tmp_path / 'trace.npz'
+    trace.save(trace_path)
+    loaded_trace = GreedyTrace.load(trace_path)
+
+    replayed = Planification(
+        plant=plant,
+        horizon=30 * 24
+    )
+    replayed.replay_trace(loaded_trace)
+    assert replayed.orders_plan == planification.orders_plan
+    assert replayed.grades_plan == planification.grades_plan
+    assert replayed.orders_completed == planification.orders_completed
+    assert replayed.benefits == planification.benefits
+    assert (replayed.stocks == planification.stocks).all()
+
+    assert GreedyTrace.first_divergence(trace, loaded_trace) is None
+    assert (loaded_trace.candidates == trace.candidates).all()
+    # the best ratio of every unit is one of its evaluated candidates
+    for step, ratios in enumerate(trace.ratios.tolist()):
+        step_candidates = trace.candidates[trace.candidates['step'] == step]
+        for unit, ratio in enumerate(ratios):
+            if ratio == ratio:
+                assert ratio == step_candidates['ratio'][step_candidates['unit'] == unit].max()
+    loaded_trace.steps['grade'][10] += 1
+    assert GreedyTrace.first_divergence(trace, loaded_trace) == 10
+    loaded_trace.orders['index'][0] += 1
+    assert GreedyTrace.first_divergence(trace, loaded_trace) == 0
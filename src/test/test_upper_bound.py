@@ -0,0 +1,26 @@
+import numpy as np
+from ..plant import Plant, RandomPlantData
+from ..planification import Planification
+from ..optimization.upper_bound import RelaxationUpperBound
+
+
+def test_fractional_knapsack():
+    values = np.array([10., 6., -1., 4.])
+    weights = np.array([5., 2., 1., 4.])
+    assert RelaxationUpperBound.fractional_knapsack(values, weights, 0) == 0
+    assert RelaxationUpperBound.fractional_knapsack(values, weights, 2) == 6
+    assert RelaxationUpperBound.fractional_knapsack(values, weights, 4.5) == 6 + 10 * 2.5 / 5
+    assert RelaxationUpperBound.fractional_knapsack(values, weights, 100) == 20
+
+
+def test_upper_bound_above_benefits():
+    for i in range(2):
+        plant_data = RandomPlantData.generate_random_data(seed=i, n_orders=1000, n_maintenance_stops=3 * i)
+        plant = Plant.from_dictionary(plant_data)
+        planification = Planification(
+            plant=plant,
+            horizon=30 * 24
+        )
+        planification.calculate_initial_solution()
+        assert planification.benefits <= planification.upper_bound
+        assert 0 <= planification.gap <= 100
@@ -0,0 +1,67 @@
+from src.plant import Plant
+from src.planification import Planification
+from src.optimization.trace import GreedyTrace
+import argparse
+
+
+def replay(args):
+    plant = Plant.from_json_file(args.input_file_path)
+    trace = GreedyTrace.load(args.trace_file_path)
+    planification = Planification(
+        plant=plant,
+        horizon=trace.horizon,
+        orders_plan={},
+        grades_plan={}
+    )
+    planification.replay_trace(trace)
+    planification.save_data(args.output_file_path)
+    return
+
+
+def diff(args):
+    trace_a = GreedyTrace.load(args.trace_file_path)
+    trace_b = GreedyTrace.load(args.other_trace_file_path)
+    step = GreedyTrace.first_divergence(trace_a, trace_b, rtol=args.rtol)
+    if step is None:
+        print(f'Traces are equal ({len(trace_a)} steps)')
+        return
+    print(f'First diverging step: {step}')
+    for name, trace in [('a', trace_a), ('b', trace_b)]:
+        if step < len(trace):
+            step_data = trace.steps[step]
+            print(f"{name}: unit={step_data['unit']} grade={step_data['grade']} "
+                  f"committed={step_data['committed']} time={step_data['time']} "
+                  f"orders={trace.step_orders(step).tolist()} ratios={trace.ratios[step].tolist()}")
+        else:
+            print(f'{name}: trace ends at {len(trace)} steps')
+    return
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+            description="Greedy trace tools"
+        )
+        subparsers = parser.add_subparsers(dest='command', required=True)
+
+        replay_parser = subparsers.add_parser('replay', help='Rebuild a planification from a trace')
+        replay_parser.add_argument('--input_file_path', dest='input_file_path',
+                                   type=str, help='Input file for planification data')
+        replay_parser.add_argument('--trace_file_path', dest='trace_file_path',
+                                   type=str, help='Trace file')
+        replay_parser.add_argument('--output_file_path', dest='output_file_path',
+                                   type=str, help='Output file for planification solution')
+        replay_parser.set_defaults(func=replay)
+
+        diff_parser = subparsers.add_parser('diff', help='First diverging step of two traces')
+        diff_parser.add_argument('trace_file_path', type=str, help='Trace file')
+        diff_parser.add_argument('other_trace_file_path', type=str, help='Trace file to compare with')
+        diff_parser.add_argument('--rtol', dest='rtol', default=0., type=float,
+                                 help='Relative tolerance for float comparisons')
+        diff_parser.set_defaults(func=diff)
+
+        args = parser.parse_args()
+        args.func(args)
+
+    except RuntimeError as e:
+        raise